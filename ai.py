@@ -1,14 +1,13 @@
-import copy
+import atexit
+import concurrent.futures
+import contextlib
+import io
 import random
+import sys
+import threading
+import time
 
-piece_values = {
-    'pawn': 100,
-    'knight': 320,
-    'bishop': 330,
-    'rook': 500,
-    'queen': 900,
-    'king': 20000
-}
+from chess_logic import piece_values
 
 # EXPANDED Opening book - Based on Magnus Carlsen, Hikaru Nakamura games
 OPENING_BOOK = {
@@ -128,95 +127,340 @@ OPENING_BOOK = {
     ],
 }
 
-# Enhanced position value tables (piece-square tables)
-pawn_table = [
-    [0,   0,   0,   0,   0,   0,   0,   0],
-    [50,  50,  50,  50,  50,  50,  50,  50],
-    [10,  10,  20,  30,  30,  20,  10,  10],
-    [5,   5,   10,  27,  27,  10,  5,   5],
-    [0,   0,   0,   25,  25,  0,   0,   0],
-    [5,   -5,  -10, 0,   0,   -10, -5,  5],
-    [5,   10,  10,  -25, -25, 10,  10,  5],
-    [0,   0,   0,   0,   0,   0,   0,   0]
-]
-
-knight_table = [
-    [-50, -40, -30, -30, -30, -30, -40, -50],
-    [-40, -20, 0,   0,   0,   0,   -20, -40],
-    [-30, 0,   10,  15,  15,  10,  0,   -30],
-    [-30, 5,   15,  20,  20,  15,  5,   -30],
-    [-30, 0,   15,  20,  20,  15,  0,   -30],
-    [-30, 5,   10,  15,  15,  10,  5,   -30],
-    [-40, -20, 0,   5,   5,   0,   -20, -40],
-    [-50, -40, -20, -30, -30, -20, -40, -50]
-]
-
-bishop_table = [
-    [-20, -10, -10, -10, -10, -10, -10, -20],
-    [-10, 0,   0,   0,   0,   0,   0,   -10],
-    [-10, 0,   5,   10,  10,  5,   0,   -10],
-    [-10, 5,   5,   10,  10,  5,   5,   -10],
-    [-10, 0,   10,  10,  10,  10,  0,   -10],
-    [-10, 10,  10,  10,  10,  10,  10,  -10],
-    [-10, 5,   0,   0,   0,   0,   5,   -10],
-    [-20, -10, -40, -10, -10, -40, -10, -20]
-]
-
-rook_table = [
-    [0,   0,   0,   0,   0,   0,   0,   0],
-    [5,   10,  10,  10,  10,  10,  10,  5],
-    [-5,  0,   0,   0,   0,   0,   0,   -5],
-    [-5,  0,   0,   0,   0,   0,   0,   -5],
-    [-5,  0,   0,   0,   0,   0,   0,   -5],
-    [-5,  0,   0,   0,   0,   0,   0,   -5],
-    [-5,  0,   0,   0,   0,   0,   0,   -5],
-    [0,   0,   0,   5,   5,   0,   0,   0]
-]
-
-queen_table = [
-    [-20, -10, -10, -5,  -5,  -10, -10, -20],
-    [-10, 0,   0,   0,   0,   0,   0,   -10],
-    [-10, 0,   5,   5,   5,   5,   0,   -10],
-    [-5,  0,   5,   5,   5,   5,   0,   -5],
-    [0,   0,   5,   5,   5,   5,   0,   -5],
-    [-10, 5,   5,   5,   5,   5,   0,   -10],
-    [-10, 0,   5,   0,   0,   0,   0,   -10],
-    [-20, -10, -10, -5,  -5,  -10, -10, -20]
-]
-
-king_middle_game = [
-    [-30, -40, -40, -50, -50, -40, -40, -30],
-    [-30, -40, -40, -50, -50, -40, -40, -30],
-    [-30, -40, -40, -50, -50, -40, -40, -30],
-    [-30, -40, -40, -50, -50, -40, -40, -30],
-    [-20, -30, -30, -40, -40, -30, -30, -20],
-    [-10, -20, -20, -20, -20, -20, -20, -10],
-    [20,  20,  0,   0,   0,   0,   20,  20],
-    [20,  30,  10,  0,   0,   10,  30,  20]
-]
-
-king_end_game = [
-    [-50, -40, -30, -20, -20, -30, -40, -50],
-    [-30, -20, -10, 0,   0,   -10, -20, -30],
-    [-30, -10, 20,  30,  30,  20,  -10, -30],
-    [-30, -10, 30,  40,  40,  30,  -10, -30],
-    [-30, -10, 30,  40,  40,  30,  -10, -30],
-    [-30, -10, 20,  30,  30,  20,  -10, -30],
-    [-30, -30, 0,   0,   0,   0,   -30, -30],
-    [-50, -30, -30, -30, -30, -30, -30, -50]
-]
+
+# Transposition table bound types
+TT_EXACT = 0
+TT_LOWER = 1  # Score is at least the stored value (beta cutoff)
+TT_UPPER = 2  # Score is at most the stored value (failed low)
+
+DEFAULT_TT_MB = 16
+
+# How long past the time limit to wait for a parallel search helper before
+# giving up on it (covers worker start-up on the first search)
+HELPER_GRACE_MS = 2000
+
+# Quiescence search limits
+QUIESCENCE_MAX_PLY = 8
+MATE_SCORE = 100000  # Less the distance in plies from the root to the mate
+MATE_THRESHOLD = 90000  # Scores beyond this are forced mates
+
+# Iterative deepening searches a window this wide either side of the previous
+# depth's score, widening it whenever the result falls outside
+ASPIRATION_WINDOW = 50
+# Root moves scoring within this margin of the best are all candidates; one is
+# picked by adding noise of up to half the margin to each score
+ROOT_VARIETY_MARGIN = 10
+DELTA_MARGIN = 200
+
+# Move ordering bands: captures that hold up under SEE, then checks, then quiet
+# moves by history score (kept below CHECK_SCORE), then captures that lose material
+GOOD_CAPTURE_SCORE = 1 << 20
+CHECK_SCORE = 1 << 18
+HISTORY_LIMIT = 1 << 16
+MAX_PLY = 64
+
+# MVV-LVA: most valuable victim first, then least valuable attacker
+_mvv_lva_order = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+mvv_lva = {victim: {attacker: 8 * (v + 1) - a for a, attacker in enumerate(_mvv_lva_order)}
+           for v, victim in enumerate(_mvv_lva_order)}
+
+
+class TranspositionTable:
+    """Fixed-size hash table of search results, keyed by Board.hash.
+
+    Every bucket holds two slots: a depth-preferred one that only yields to an
+    equal or deeper search (or an entry from an older search), and an
+    always-replace one. Each slot is two 64-bit words in one flat array,
+    [key ^ data, data], with data = score | depth | bound | move code | age.
+    XOR-ing the key with the data lets a reader reject a slot written
+    halfway, so the words can live in memory shared between processes.
+    Scores are from the point of view of the side to move.
+    """
+    SLOT_WORDS = 2
+    BUCKET_SLOTS = 2
+
+    def __init__(self, size_mb=DEFAULT_TT_MB, buffer=None):
+        bucket_bytes = self.SLOT_WORDS * self.BUCKET_SLOTS * 8
+        if buffer is None:
+            buckets = max(1, int(size_mb * 1024 * 1024) // bucket_bytes)
+            buckets = 1 << (buckets.bit_length() - 1)  # Power of two for mask indexing
+            buffer = bytearray(buckets * bucket_bytes)
+        else:
+            buckets = len(buffer) // bucket_bytes
+            buckets = 1 << (buckets.bit_length() - 1)
+        self.buffer = buffer
+        self.words = memoryview(buffer).cast('B').cast('Q')
+        self.mask = buckets - 1
+        self.age = 0
+
+    @staticmethod
+    def size_for(size_mb):
+        """Bytes of buffer a table of size_mb uses (to allocate shared memory)"""
+        bucket_bytes = TranspositionTable.SLOT_WORDS * TranspositionTable.BUCKET_SLOTS * 8
+        buckets = max(1, int(size_mb * 1024 * 1024) // bucket_bytes)
+        return (1 << (buckets.bit_length() - 1)) * bucket_bytes
+
+    def new_search(self):
+        """Age the existing entries so the depth-preferred slots can be reclaimed"""
+        self.age = (self.age + 1) & 0x3F
+
+    def clear(self):
+        words = self.words
+        for i in range(len(words)):
+            words[i] = 0
+
+    def probe(self, key, ply=0):
+        """Return (depth, score, bound, move code) stored for key, or None.
+
+        Mate scores are kept as distance from the stored node; ply converts
+        them back to distance from the current root.
+        """
+        words = self.words
+        index = (key & self.mask) << 2
+        for slot in (index, index + 2):
+            data = words[slot + 1]
+            if words[slot] ^ data == key:
+                score = (data & 0xFFFFFFFF) - 0x80000000
+                if score > MATE_THRESHOLD:
+                    score -= ply
+                elif score < -MATE_THRESHOLD:
+                    score += ply
+                return ((data >> 32) & 0xFF, score, (data >> 40) & 0x3, (data >> 42) & 0xFFFF)
+        return None
+
+    def store(self, key, depth, score, bound, move_code=0, ply=0):
+        """Store a search result; ply is the node's distance from the root (see probe)"""
+        if score > MATE_THRESHOLD:
+            score += ply
+        elif score < -MATE_THRESHOLD:
+            score -= ply
+        words = self.words
+        index = (key & self.mask) << 2
+        data = ((int(score) + 0x80000000) & 0xFFFFFFFF) | (depth << 32) | (bound << 40) | \
+            (move_code << 42) | (self.age << 58)
+        kept = words[index + 1]
+        same_key = words[index] ^ kept == key
+        if same_key or depth >= (kept >> 32) & 0xFF or (kept >> 58) != self.age:
+            if same_key and not move_code:
+                # Keep the best move we already know for this position
+                data |= ((kept >> 42) & 0xFFFF) << 42
+            words[index] = key ^ data
+            words[index + 1] = data
+        else:
+            words[index + 2] = key ^ data
+            words[index + 3] = data
+
+
+# Bot difficulty -> (time budget in ms, maximum depth)
+DIFFICULTY_LEVELS = {
+    1: (150, 2),
+    2: (300, 3),
+    3: (700, 4),
+    4: (1500, 5),
+    5: (3000, 6),
+}
+
+
+def difficulty_settings(difficulty):
+    """(time budget in ms, maximum depth) for a difficulty level, clamped to 1-5"""
+    level = min(max(int(difficulty), 1), max(DIFFICULTY_LEVELS))
+    return DIFFICULTY_LEVELS[level]
+
+
+# Selective search per difficulty level: null-move pruning, late move reductions
+# and futility pruning. The easiest level searches every move to full depth.
+PRUNING_LEVELS = {
+    1: {'null_move': False, 'lmr': False, 'futility': False},
+    2: {'null_move': False, 'lmr': True, 'futility': True},
+    3: {'null_move': True, 'lmr': True, 'futility': True},
+    4: {'null_move': True, 'lmr': True, 'futility': True},
+    5: {'null_move': True, 'lmr': True, 'futility': True},
+}
+
+NULL_MOVE_REDUCTION = 2
+LMR_MIN_DEPTH = 3
+LMR_FULL_DEPTH_MOVES = 3  # Moves searched at full depth before reductions start
+FUTILITY_MARGINS = (0, 200, 500)  # By remaining depth; only depths 1 and 2 are pruned
+
+
+def pruning_settings(difficulty):
+    """Which selective search techniques a difficulty level uses, clamped to 1-5"""
+    level = min(max(int(difficulty), 1), max(PRUNING_LEVELS))
+    return dict(PRUNING_LEVELS[level])
+
+
+class SearchBudget:
+    """Time and node limits shared by every ChessAI taking part in one search"""
+    CHECK_INTERVAL = 8  # Nodes between clock reads (evaluated nodes are slow)
+
+    def __init__(self, time_limit_ms=None, node_limit=None):
+        self.start = time.perf_counter()
+        self.deadline = self.start + time_limit_ms / 1000 if time_limit_ms else None
+        self.node_limit = node_limit
+        self.nodes = 0
+        self.stopped = False
+
+    def count_node(self):
+        """Count a node; returns True once the search has to stop"""
+        self.nodes += 1
+        if not self.stopped and self.nodes % self.CHECK_INTERVAL == 0:
+            if self.node_limit and self.nodes >= self.node_limit:
+                self.stopped = True
+            elif self.deadline and time.perf_counter() >= self.deadline:
+                self.stopped = True
+        return self.stopped
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+
+_shared_table = None
+
+
+def shared_table():
+    """Process-wide table reused across bot moves, so earlier searches still help"""
+    global _shared_table
+    if _shared_table is None:
+        _shared_table = TranspositionTable(DEFAULT_TT_MB)
+    return _shared_table
+
+
+_shared_memory_table = None  # (TranspositionTable, SharedMemory) of the parallel search
+_worker_pool = None
+_worker_pool_size = 0
+_worker_tables = {}  # In worker processes: shared memory name -> (table, SharedMemory)
+# Bot searches run in concurrent server threads; this guards building the
+# shared table and the pool, and starting helper processes
+_worker_lock = threading.Lock()
+
+
+def shared_memory_table():
+    """Process-wide table in shared memory, which parallel search workers attach to"""
+    global _shared_memory_table
+    with _worker_lock:
+        if _shared_memory_table is None:
+            from multiprocessing import shared_memory
+            shm = shared_memory.SharedMemory(create=True,
+                                             size=TranspositionTable.size_for(DEFAULT_TT_MB))
+            _shared_memory_table = (TranspositionTable(DEFAULT_TT_MB, buffer=shm.buf), shm)
+            atexit.register(_release_shared_memory)
+        return _shared_memory_table[0]
+
+
+def _release_shared_memory():
+    global _shared_memory_table
+    table, shm = _shared_memory_table
+    _shared_memory_table = None
+    table.words.release()
+    shm.close()
+    shm.unlink()
+
+
+def _helper_pool(helpers):
+    """Process pool for the helper searches, rebuilt if the worker count changes.
+    Call with _worker_lock held."""
+    global _worker_pool, _worker_pool_size
+    if _worker_pool is None or _worker_pool_size != helpers:
+        import multiprocessing
+        if _worker_pool is not None:
+            _worker_pool.shutdown(wait=False)
+        # Never fork: the web server's threads (and their locks) must not be copied
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        context = multiprocessing.get_context(method)
+        if method == 'forkserver':
+            # Not the default __main__: under python app.py that would build the web app
+            context.set_forkserver_preload(['ai', 'chess_logic'])
+        _worker_pool = concurrent.futures.ProcessPoolExecutor(max_workers=helpers, mp_context=context)
+        _worker_pool_size = helpers
+    return _worker_pool
+
+
+@contextlib.contextmanager
+def _main_script_hidden():
+    """Keep helper processes started in this block from importing the main script.
+
+    multiprocessing re-imports it (as __mp_main__) in every new forkserver or
+    spawn child, which under python app.py would set up the whole web app
+    again. The helpers only need ai and chess_logic. Call with _worker_lock held.
+    """
+    main = sys.modules['__main__']
+    saved = {name: main.__dict__[name] for name in ('__spec__', '__file__') if name in main.__dict__}
+    main.__spec__ = None
+    main.__dict__.pop('__file__', None)
+    try:
+        yield
+    finally:
+        main.__dict__.update(saved)
+
+
+def _release_worker_tables():
+    """Detach a worker process from the shared tables before it exits"""
+    for table, shm in _worker_tables.values():
+        table.words.release()
+        shm.close()
+    _worker_tables.clear()
+
+
+def _helper_search(shm_name, age, fen, color, depth, time_limit_ms, node_limit, pruning, index):
+    """Lazy SMP helper, run in a worker process: search the position into the shared
+    table and return (move code, completed depth, score, nodes)"""
+    from chess_logic import Board
+    
+    entry = _worker_tables.get(shm_name)
+    if entry is None:
+        from multiprocessing import shared_memory
+        if not _worker_tables:
+            atexit.register(_release_worker_tables)
+        shm = shared_memory.SharedMemory(name=shm_name)
+        entry = _worker_tables[shm_name] = (TranspositionTable(DEFAULT_TT_MB, buffer=shm.buf), shm)
+    table = entry[0]
+    table.age = age
+    
+    ai = ChessAI(Board.from_fen(fen), color, table, seed=index)
+    ai.pruning = pruning
+    ai.variety_margin = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Odd helpers skip depth 1, so the searches drift apart and fill the table differently
+        move = ai.search(depth, time_limit_ms, node_limit, start_depth=1 + index % 2)
+    stats = ai.search_stats
+    return (move.code if move else None, stats.get('depth', 0), stats.get('eval'),
+            stats.get('nodes', 0))
+
 
 class ChessAI:
-    def __init__(self, board, color):
+    def __init__(self, board, color, tt=None, seed=None, workers=1):
         self.board = board
         self.color = color
         self.opponent_color = 'white' if color == 'black' else 'black'
         self.nodes_searched = 0
+        # Searches with more than one worker process share a table in shared memory
+        self.workers = max(1, workers)
+        if tt is None:
+            tt = shared_memory_table() if self.workers > 1 else shared_table()
+        self.tt = tt
+        self.budget = None  # SearchBudget of the running search, if any
+        self.search_stats = {}
+        # Quiet moves that caused a cutoff: two per ply, and a butterfly table
+        # per side indexed by from and to square (the low 12 bits of Move.code)
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = {'white': [0] * 4096, 'black': [0] * 4096}
+        # Triangular principal variation table: row ply holds the best line
+        # found from that ply, in columns ply .. pv_length[ply] - 1
+        self.pv_table = [[None] * MAX_PLY for _ in range(MAX_PLY)]
+        self.pv_length = [0] * MAX_PLY
+        self.pruning = dict(PRUNING_LEVELS[max(PRUNING_LEVELS)])
+        # Book choices and the pick among near-equal root moves; seed for repeatable games
+        self.rng = random.Random(seed)
+        self.variety_margin = ROOT_VARIETY_MARGIN
         
     def get_opening_move(self):
         """Check if we can use opening book - EXPANDED"""
+        from chess_logic import START_FEN
+        
         if len(self.board.moves_history) > 12:  # Use book for first 12 moves
             return None
+        if self.board.start_fen != START_FEN:
+            return None  # The book is keyed on moves played from the initial position
         
         # Build move history string
         move_str = ''
@@ -233,7 +477,7 @@ class ChessAI:
         if move_str in OPENING_BOOK:
             book_moves = OPENING_BOOK[move_str]
             # Pick a random move from book to add variety
-            book_move = random.choice(book_moves)
+            book_move = self.rng.choice(book_moves)
             
             # Convert to Move object
             from chess_logic import Square, Move
@@ -246,88 +490,37 @@ class ChessAI:
             if piece and piece.color == self.color:
                 self.board.calc_moves(piece, initial.row, initial.col)
                 if move in piece.moves:
-                    print(f"Opening book move: {from_sq}{to_sq}")
+                    print(f"Opening book move: {move.uci()}")
                     return move
         
         return None
         
     def is_endgame(self):
         """Detect endgame - FASTER"""
-        piece_count = 0
-        queen_count = 0
-        for row in range(8):
-            for col in range(8):
-                piece = self.board.squares[row][col].piece
-                if piece and piece.name != 'king':
-                    piece_count += 1
-                    if piece.name == 'queen':
-                        queen_count += 1
+        board = self.board
+        # Everything but the two kings
+        piece_count = board.piece_count('white') + board.piece_count('black') - 2
+        queen_count = board.piece_count('white', 'queen') + board.piece_count('black', 'queen')
         return piece_count <= 6 or queen_count == 0
 
-    def count_attackers_and_defenders(self, row, col, color):
-        """OPTIMIZED: Count how many pieces attack and defend a square"""
-        attackers = 0
-        defenders = 0
-        
-        # Simplified - only check immediate threats
-        directions = [(-1,-1), (-1,0), (-1,1), (0,-1), (0,1), (1,-1), (1,0), (1,1)]
-        knight_moves = [(-2,-1), (-2,1), (-1,-2), (-1,2), (1,-2), (1,2), (2,-1), (2,1)]
-        
-        # Check knight attacks
-        for dr, dc in knight_moves:
-            r, c = row + dr, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                piece = self.board.squares[r][c].piece
-                if piece and piece.name == 'knight':
-                    if piece.color == color:
-                        defenders += 1
-                    else:
-                        attackers += 1
-        
-        # Check sliding pieces (simplified)
-        for dr, dc in directions:
-            for dist in range(1, 8):
-                r, c = row + dr * dist, col + dc * dist
-                if not (0 <= r < 8 and 0 <= c < 8):
-                    break
-                piece = self.board.squares[r][c].piece
-                if piece:
-                    if piece.name in ['queen', 'rook', 'bishop']:
-                        if piece.color == color:
-                            defenders += 1
-                        else:
-                            attackers += 1
-                    break
-        
-        return attackers, defenders
-
     def is_piece_hanging(self, row, col):
-        """Check if a piece is undefended or hanging"""
+        """Check if the opponent wins material by capturing the piece (static exchange)"""
         piece = self.board.squares[row][col].piece
         if not piece:
             return False
         
-        attackers, defenders = self.count_attackers_and_defenders(row, col, piece.color)
-        
-        # Piece is hanging if attacked but not defended
-        return attackers > 0 and defenders == 0
+        opponent = 'black' if piece.color == 'white' else 'white'
+        return self.board.see_square(row, col, opponent) > 0
 
     def evaluate_king_safety(self, color):
         """OPTIMIZED: Faster king safety evaluation"""
-        from chess_logic import King, Pawn
+        from chess_logic import Pawn
         
         safety_score = 0
         
-        # Find king position (cache this if possible)
         king_row, king_col = None, None
-        for row in range(8):
-            for col in range(8):
-                piece = self.board.squares[row][col].piece
-                if isinstance(piece, King) and piece.color == color:
-                    king_row, king_col = row, col
-                    break
-            if king_row is not None:
-                break
+        for _, king_row, king_col in self.board.iter_pieces(color, 'king'):
+            break
         
         if king_row is None:
             return 0
@@ -357,48 +550,38 @@ class ChessAI:
         """OPTIMIZED: Faster piece activity evaluation"""
         activity_score = 0
         
-        # Only check developed pieces (not pawns/king)
-        for row in range(8):
-            for col in range(8):
-                piece = self.board.squares[row][col].piece
-                if piece and piece.color == color and piece.name in ['knight', 'bishop', 'rook', 'queen']:
-                    # Simple mobility estimate without full calculation
-                    if piece.name == 'knight':
-                        # Knights in center are more active
-                        center_distance = abs(row - 3.5) + abs(col - 3.5)
-                        activity_score += (7 - center_distance) * 3
-                    elif piece.name == 'bishop':
-                        # Bishops on long diagonals
-                        if (row == col) or (row + col == 7):
-                            activity_score += 10
-                    elif piece.name == 'rook':
-                        # Rooks on open files (simplified check)
-                        has_pawn = False
-                        for r in range(8):
-                            p = self.board.squares[r][col].piece
-                            if p and p.name == 'pawn':
-                                has_pawn = True
-                                break
-                        if not has_pawn:
-                            activity_score += 15  # Open file bonus
+        from chess_logic import FILE_A
+        
+        board = self.board
+        # Simple mobility estimates without full calculation (queens score nothing)
+        for _, row, col in board.iter_pieces(color, 'knight'):
+            # Knights in center are more active
+            center_distance = abs(row - 3.5) + abs(col - 3.5)
+            activity_score += (7 - center_distance) * 3
+        
+        for _, row, col in board.iter_pieces(color, 'bishop'):
+            # Bishops on long diagonals
+            if (row == col) or (row + col == 7):
+                activity_score += 10
+        
+        pawns = board.bitboards['white']['pawn'] | board.bitboards['black']['pawn']
+        for _, row, col in board.iter_pieces(color, 'rook'):
+            # Rooks on open files (simplified check)
+            if not pawns & (FILE_A << col):
+                activity_score += 15  # Open file bonus
         
         return activity_score
 
     def evaluate_pawn_structure(self, color):
         """OPTIMIZED: Faster pawn structure evaluation"""
-        from chess_logic import Pawn
-        
         structure_score = 0
         pawn_files = {}
         
         # Collect pawns by file
-        for row in range(8):
-            for col in range(8):
-                piece = self.board.squares[row][col].piece
-                if isinstance(piece, Pawn) and piece.color == color:
-                    if col not in pawn_files:
-                        pawn_files[col] = []
-                    pawn_files[col].append(row)
+        for _, row, col in self.board.iter_pieces(color, 'pawn'):
+            if col not in pawn_files:
+                pawn_files[col] = []
+            pawn_files[col].append(row)
         
         for col, rows in pawn_files.items():
             # Penalty for doubled pawns
@@ -423,16 +606,22 @@ class ChessAI:
         threat_score = 0
         
         # Quick check for hanging pieces (sample only major pieces)
-        for row in range(8):
-            for col in range(8):
-                piece = self.board.squares[row][col].piece
-                if piece and piece.name in ['queen', 'rook', 'bishop', 'knight']:
-                    attackers, defenders = self.count_attackers_and_defenders(row, col, piece.color)
+        for piece_color in ('white', 'black'):
+            capturer = 'black' if piece_color == 'white' else 'white'
+            # Squares the capturer hits at all, from the board's cached attack map
+            attacked = self.board.attack_map(capturer)[1]
+            for piece, row, col in self.board.iter_pieces(piece_color):
+                if piece.name in ('queen', 'rook', 'bishop', 'knight'):
+                    if not attacked & (1 << (row * 8 + col)):
+                        continue
+                    # Hanging means the exchange on its square wins material
+                    if self.board.see_square(row, col, capturer) <= 0:
+                        continue
                     
-                    if piece.color != color and attackers > defenders:
+                    if piece_color != color:
                         # Enemy piece is hanging - bonus
                         threat_score += piece_values.get(piece.name, 0) // 4
-                    elif piece.color == color and attackers > defenders:
+                    else:
                         # Our piece is hanging - penalty
                         threat_score -= piece_values.get(piece.name, 0) // 4
         
@@ -440,33 +629,10 @@ class ChessAI:
 
     def evaluate(self):
         """OPTIMIZED evaluation - faster calculations"""
-        score = 0
-        is_endgame = self.is_endgame()
-        
-        # Material and position evaluation
-        for row in range(8):
-            for col in range(8):
-                piece = self.board.squares[row][col].piece
-                if piece:
-                    material = piece_values.get(piece.name, 0)
-                    piece_row = row if piece.color == 'white' else 7 - row
-                    position_bonus = 0
-                    
-                    if piece.name == 'pawn':
-                        position_bonus = pawn_table[piece_row][col]
-                    elif piece.name == 'knight':
-                        position_bonus = knight_table[piece_row][col]
-                    elif piece.name == 'bishop':
-                        position_bonus = bishop_table[piece_row][col]
-                    elif piece.name == 'rook':
-                        position_bonus = rook_table[piece_row][col]
-                    elif piece.name == 'queen':
-                        position_bonus = queen_table[piece_row][col]
-                    elif piece.name == 'king':
-                        position_bonus = king_end_game[piece_row][col] if is_endgame else king_middle_game[piece_row][col]
-                    
-                    piece_score = material + position_bonus
-                    score += piece_score if piece.color == self.color else -piece_score
+        # Material and position: kept up to date by the board on every move
+        score = self.board.material_score()
+        if self.color == 'black':
+            score = -score
         
         # Reduced weight strategic factors for speed
         my_king_safety = self.evaluate_king_safety(self.color)
@@ -484,212 +650,540 @@ class ChessAI:
         threat_evaluation = self.evaluate_threats(self.color)
         score += threat_evaluation * 0.4
         
-        return score
+        # Whole centipawns, rounded once here: the transposition table keeps
+        # integer scores, and truncating bounds there would shift them
+        return round(score)
 
     def order_moves(self, moves):
-        """ENHANCED move ordering with tactical priorities"""
-        from chess_logic import King
+        """Cheap move ordering from lookups only, no move is played.
+
+        Captures and promotions score by MVV-LVA and go first unless SEE says
+        they lose material, in which case they go last. Quiet moves that give
+        check come next, then the rest by history score, with the piece-square
+        gain of the move breaking ties.
+        """
+        from chess_logic import piece_square_scores
         
-        scored_moves = []
+        if not moves:
+            return moves
+        board = self.board
+        squares = board.squares
+        color = squares[moves[0].initial.row][moves[0].initial.col].piece.color
+        history = self.history[color]
+        tables = piece_square_scores()[color]
+        sign = 1 if color == 'white' else -1
         
+        scored_moves = []
         for move in moves:
-            score = 0
-            target = self.board.squares[move.final.row][move.final.col].piece
-            moving_piece = self.board.squares[move.initial.row][move.initial.col].piece
-            
-            # MVV-LVA: Most Valuable Victim - Least Valuable Attacker
-            if target:
-                victim_value = piece_values.get(target.name, 0)
-                attacker_value = piece_values.get(moving_piece.name, 0)
-                score += 10000 + victim_value * 10 - attacker_value
-            
-            # Bonus for checks
-            temp_board = copy.deepcopy(self.board)
-            temp_piece = temp_board.squares[move.initial.row][move.initial.col].piece
-            temp_board.move(temp_piece, move, testing=True)
-            
-            if temp_board.in_check_king(self.opponent_color):
-                score += 5000  # High priority for checks
-            
-            # Bonus for attacking king zone
-            opponent_king_pos = None
-            for row in range(8):
-                for col in range(8):
-                    piece = temp_board.squares[row][col].piece
-                    if isinstance(piece, King) and piece.color == self.opponent_color:
-                        opponent_king_pos = (row, col)
-                        break
-                if opponent_king_pos:
-                    break
-            
-            if opponent_king_pos:
-                king_row, king_col = opponent_king_pos
-                distance_to_king = abs(move.final.row - king_row) + abs(move.final.col - king_col)
-                if distance_to_king <= 2:
-                    score += 200  # Bonus for attacking near king
-            
-            # Center control bonus
-            center_distance = abs(move.final.row - 3.5) + abs(move.final.col - 3.5)
-            score += (7 - center_distance) * 5
-            
-            # Penalty for moving into attacked squares
-            if not target:  # Only check if not capturing
-                attackers, defenders = self.count_attackers_and_defenders(
-                    move.final.row, move.final.col, moving_piece.color
-                )
-                if attackers > defenders:
-                    score -= 1000  # Avoid moving into danger
-            
+            if move.promotion or board.is_capture(move):
+                attacker = squares[move.initial.row][move.initial.col].piece.name
+                target = squares[move.final.row][move.final.col].piece
+                score = mvv_lva[target.name if target else 'pawn'][attacker]
+                if move.promotion:
+                    score += mvv_lva[move.promotion]['pawn']
+                exchange = board.see(move)
+                score = GOOD_CAPTURE_SCORE + score if exchange >= 0 else exchange
+            else:
+                table = tables[squares[move.initial.row][move.initial.col].piece.name][0]
+                score = history[move.code & 0xFFF] + sign * (
+                    table[move.final.row * 8 + move.final.col]
+                    - table[move.initial.row * 8 + move.initial.col])
+                if board.gives_check(move):
+                    score += CHECK_SCORE
             scored_moves.append((score, move))
         
         scored_moves.sort(reverse=True, key=lambda x: x[0])
         return [move for _, move in scored_moves]
 
-    def minimax(self, depth, alpha, beta, maximizing):
-        """OPTIMIZED minimax with aggressive pruning"""
+    def record_cutoff(self, move, color, depth, ply):
+        """Remember a quiet move that caused a beta cutoff as a killer and in the history"""
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        history = self.history[color]
+        index = move.code & 0xFFF
+        history[index] += depth * depth
+        if history[index] >= HISTORY_LIMIT:
+            # Age the whole table so scores stay below CHECK_SCORE
+            for i, value in enumerate(history):
+                history[i] = value >> 1
+
+    def negamax(self, depth, alpha, beta, color, ply, allow_null=True):
+        """Alpha-beta negamax with a transposition table and selective search.
+
+        Scores are from the point of view of color, the side to move, and the
+        search runs in place on self.board. ply is the distance from the root,
+        which indexes the killer moves and the PV table. self.pruning switches
+        null-move pruning, late move reductions and futility pruning on or off;
+        every legal move is still considered.
+        """
+        from chess_logic import Move
+        
+        if depth <= 0 or ply >= MAX_PLY - QUIESCENCE_MAX_PLY - 1:
+            return self.quiescence(alpha, beta, color, ply)
+        
         self.nodes_searched += 1
+        self.pv_length[ply] = ply
+        if self.budget is not None and self.budget.count_node():
+            return 0  # Out of time or nodes; the caller discards this iteration
         
-        if depth == 0:
-            return self.evaluate()
+        board = self.board
+        enemy = 'black' if color == 'white' else 'white'
+        key = board.hash
+        hash_move = None
+        entry = self.tt.probe(key, ply)
+        if entry is not None:
+            tt_depth, tt_score, tt_bound, tt_move = entry
+            if tt_move:
+                hash_move = Move.from_code(tt_move)
+            if tt_depth >= depth:
+                if tt_bound == TT_EXACT:
+                    return tt_score
+                if tt_bound == TT_LOWER:
+                    alpha = max(alpha, tt_score)
+                else:
+                    beta = min(beta, tt_score)
+                if alpha >= beta:
+                    return tt_score
+        alpha_orig = alpha
         
-        moves = self.get_all_moves(self.color if maximizing else self.opponent_color)
+        pruning = self.pruning
+        in_check = board.in_check_king(color)
+        static_eval = None
         
-        if not moves:
-            if self.board.in_check_king(self.color if maximizing else self.opponent_color):
-                return -100000 if maximizing else 100000
+        # Null move: if passing still leaves us at or past beta, a real move will too.
+        # Not in check, not twice in a row, and not with only pawns left, where
+        # zugzwang makes passing better than every legal move.
+        own = board.bitboards[color]
+        if (pruning['null_move'] and allow_null and ply > 0 and not in_check
+                and depth > NULL_MOVE_REDUCTION
+                and own['knight'] | own['bishop'] | own['rook'] | own['queen']):
+            static_eval = self.evaluate_for(color)
+            if static_eval >= beta:
+                undo = board.make_null_move()
+                score = -self.negamax(depth - 1 - NULL_MOVE_REDUCTION, -beta, -beta + 1,
+                                      enemy, ply + 1, False)
+                board.unmake_null_move(undo)
+                if self.budget is not None and self.budget.stopped:
+                    return 0
+                if score >= beta:
+                    return beta  # Fail hard: a mate found after passing is not to be trusted
+        
+        # Futility: near the leaves, quiet moves cannot lift a hopeless static score
+        futile = False
+        if (pruning['futility'] and depth < len(FUTILITY_MARGINS) and not in_check
+                and abs(alpha) < MATE_THRESHOLD and abs(beta) < MATE_THRESHOLD):
+            if static_eval is None:
+                static_eval = self.evaluate_for(color)
+            futile = static_eval + FUTILITY_MARGINS[depth] <= alpha
+        
+        # Hash move and captures come first; quiet moves are only generated if nothing cuts off
+        killers = self.killers[ply]
+        moves = board.iter_moves(color, hash_move=hash_move, killers=killers, order=self.order_moves)
+        best_move = None
+        best_score = -float('inf')
+        pruned = False
+        searched = 0
+        
+        for index, move in enumerate(moves):
+            quiet = not move.promotion and not board.is_capture(move)
+            reduction = 0
+            if quiet and not in_check and (futile or index >= LMR_FULL_DEPTH_MOVES) \
+                    and not board.gives_check(move):
+                if futile:
+                    pruned = True
+                    continue
+                if pruning['lmr'] and depth >= LMR_MIN_DEPTH and move not in killers:
+                    reduction = 1 if index < 2 * LMR_FULL_DEPTH_MOVES else 2
+            
+            undo = board.make_move(move)
+            if not searched:
+                score = -self.negamax(depth - 1, -beta, -alpha, enemy, ply + 1)
+            else:
+                # Principal variation search: later moves only have to be shown no
+                # better than alpha, with a zero window (and reduced depth if late and
+                # quiet). One that beats alpha anyway is searched again in full.
+                score = -self.negamax(depth - 1 - reduction, -alpha - 1, -alpha, enemy, ply + 1)
+                if score > alpha and reduction:
+                    score = -self.negamax(depth - 1, -alpha - 1, -alpha, enemy, ply + 1)
+                if alpha < score < beta:
+                    score = -self.negamax(depth - 1, -beta, -alpha, enemy, ply + 1)
+            board.unmake_move(undo)
+            searched += 1
+            if self.budget is not None and self.budget.stopped:
+                return 0
+            
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self._update_pv(ply, move)
+                    if alpha >= beta:
+                        if quiet:
+                            self.record_cutoff(move, color, depth, ply)
+                        break
+        
+        if best_move is None:
+            if pruned:
+                return static_eval  # Every move was futile: fail low on the static score
+            return -MATE_SCORE + ply if in_check else 0  # Nearer mates score higher
+        
+        if best_score <= alpha_orig:
+            bound = TT_UPPER
+        elif best_score >= beta:
+            bound = TT_LOWER
+        else:
+            bound = TT_EXACT
+        self.tt.store(key, depth, best_score, bound, best_move.code, ply)
+        return best_score
+
+    def _update_pv(self, ply, move):
+        """move is the new best at ply: its line is move followed by the child's line"""
+        pv = self.pv_table[ply]
+        child = self.pv_table[ply + 1]
+        pv[ply] = move
+        length = self.pv_length[ply + 1]
+        pv[ply + 1:length] = child[ply + 1:length]
+        self.pv_length[ply] = max(length, ply + 1)
+
+    def principal_variation(self):
+        """Best line of the last search, from the root"""
+        return self.pv_table[0][:self.pv_length[0]]
+
+    def evaluate_for(self, color):
+        """Static evaluation from color's point of view"""
+        score = self.evaluate()
+        return score if color == self.color else -score
+
+    def quiescence(self, alpha, beta, color, ply, qdepth=0):
+        """Search captures and promotions until the position is quiet.
+
+        Scores are from color's point of view, like negamax. The side to move
+        may stand pat on the static evaluation. Captures that cannot lift the
+        score past alpha even with DELTA_MARGIN to spare, and captures that
+        lose material, are skipped. In check every evasion is searched
+        instead, since standing pat is not an option there.
+        """
+        self.nodes_searched += 1
+        self.pv_length[ply] = ply
+        if self.budget is not None and self.budget.count_node():
             return 0
         
-        moves = self.order_moves(moves)
+        board = self.board
+        if qdepth >= QUIESCENCE_MAX_PLY:
+            return self.evaluate_for(color)
         
-        # MORE aggressive move reduction for speed
-        if depth >= 3:
-            max_moves = 10
-        elif depth >= 2:
-            max_moves = 15
+        in_check = board.in_check_king(color)
+        if in_check:
+            stand_pat = None
+            best = -float('inf')
+            moves = board.iter_moves(color, order=self.order_captures)
         else:
-            max_moves = 20
-        moves = moves[:max_moves]
-        
-        if maximizing:
-            max_eval = -float('inf')
-            for move in moves:
-                temp_board = copy.deepcopy(self.board)
-                piece = temp_board.squares[move.initial.row][move.initial.col].piece
-                temp_board.move(piece, move, testing=True)
-                
-                temp_ai = ChessAI(temp_board, self.color)
-                eval = temp_ai.minimax(depth - 1, alpha, beta, False)
-                
-                max_eval = max(max_eval, eval)
-                alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break  # Beta cutoff
+            stand_pat = self.evaluate_for(color)
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            best = stand_pat
+            moves = board.iter_moves(color, stage='captures', order=self.order_captures)
+        
+        enemy = 'black' if color == 'white' else 'white'
+        for move in moves:
+            if stand_pat is not None:
+                # Delta pruning: even the whole gain plus a margin leaves us below alpha
+                if stand_pat + self.capture_gain(move) + DELTA_MARGIN <= alpha:
+                    continue
+                if self.is_losing_capture(move):
+                    continue
             
-            return max_eval
-        else:
-            min_eval = float('inf')
-            for move in moves:
-                temp_board = copy.deepcopy(self.board)
-                piece = temp_board.squares[move.initial.row][move.initial.col].piece
-                temp_board.move(piece, move, testing=True)
-                
-                temp_ai = ChessAI(temp_board, self.color)
-                eval = temp_ai.minimax(depth - 1, alpha, beta, True)
-                
-                min_eval = min(min_eval, eval)
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    break  # Alpha cutoff
+            undo = board.make_move(move)
+            score = -self.quiescence(-beta, -alpha, enemy, ply + 1, qdepth + 1)
+            board.unmake_move(undo)
+            if self.budget is not None and self.budget.stopped:
+                return 0
             
-            return min_eval
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        
+        if best == -float('inf'):
+            return -MATE_SCORE + ply  # In check with no evasion
+        return best
+
+    def capture_gain(self, move):
+        """Material a capture or promotion wins at once"""
+        target = self.board.squares[move.final.row][move.final.col].piece
+        if target is not None:
+            gain = piece_values[target.name]
+        elif move.initial.col != move.final.col and \
+                self.board.squares[move.initial.row][move.initial.col].piece.name == 'pawn':
+            gain = piece_values['pawn']  # En passant
+        else:
+            gain = 0
+        if move.promotion:
+            gain += piece_values[move.promotion] - piece_values['pawn']
+        return gain
+
+    def is_losing_capture(self, move):
+        """Static exchange test: the capture loses material after the best recaptures"""
+        return self.board.see(move) < 0
+
+    def order_captures(self, moves):
+        """MVV-LVA order for quiescence: biggest victim first, cheapest attacker next"""
+        squares = self.board.squares
+        
+        def score(move):
+            attacker = squares[move.initial.row][move.initial.col].piece
+            return self.capture_gain(move) * 10 - piece_values[attacker.name] // 10
+        
+        return sorted(moves, key=score, reverse=True)
 
     def get_all_moves(self, color):
         """Get all legal moves - CACHED"""
-        moves = []
-        for row in range(8):
-            for col in range(8):
-                piece = self.board.squares[row][col].piece
-                if piece and piece.color == color:
-                    self.board.calc_moves(piece, row, col, bool=True)
-                    moves.extend(piece.moves)
-        return moves
-
-    def get_best_move(self, depth=3):
-        """Find best move with ENHANCED attacking/defensive play"""
-        self.nodes_searched = 0
+        return self.board.get_all_moves(color)
+
+    def get_best_move(self, depth=3, time_limit_ms=None, node_limit=None):
+        """Find best move with ENHANCED attacking/defensive play.
+
+        Plays from the opening book if it can, else searches (see search). With
+        workers > 1 the search runs in parallel over a process pool.
+        Statistics of the search are left in self.search_stats.
+        """
+        self.search_stats = {}
         
         # Try opening book first
         book_move = self.get_opening_move()
         if book_move:
             print(f"Using opening book move")
+            self.search_stats = {'book': True, 'depth': 0, 'nodes': 0, 'time_ms': 0.0}
             return book_move
         
-        best_move = None
-        best_value = -float('inf')
+        self.tt.new_search()
+        if self.workers > 1 and _shared_memory_table is not None \
+                and self.tt is _shared_memory_table[0]:
+            return self._parallel_search(depth, time_limit_ms, node_limit)
+        return self.search(depth, time_limit_ms, node_limit)
+
+    def search(self, depth, time_limit_ms=None, node_limit=None, start_depth=1):
+        """Iterative deepening search of the position, without the opening book.
+
+        Deepens from start_depth up to depth, each iteration searching an
+        aspiration window around the previous score. With a time budget (ms)
+        or node budget the search stops as soon as either runs out, and a move
+        from the last completed iteration is played: the best one, or with
+        variety_margin set, a seeded random pick among the moves scoring within
+        that margin of it.
+        """
+        from chess_logic import Move
+        
+        self.nodes_searched = 0
+        budget = SearchBudget(time_limit_ms, node_limit)
         
         moves = self.get_all_moves(self.color)
         if not moves:
             return None
         
         moves = self.order_moves(moves)
+        entry = self.tt.probe(self.board.hash)
+        if entry is not None and entry[3]:
+            # Best move of an earlier search of this position goes first
+            hash_move = Move.from_code(entry[3])
+            if hash_move in moves:
+                moves.remove(hash_move)
+                moves.insert(0, hash_move)
         
-        # Search top moves only for speed
-        search_moves = min(18, len(moves))
+        print(f"Evaluating {len(moves)} candidate moves...")
         
-        print(f"Evaluating {search_moves} candidate moves...")
+        self.budget = budget
+        best_move = moves[0]
+        best_value = None
+        best_line = []
+        candidates = [(best_move, 0)]
+        completed_depth = 0
+        for current_depth in range(min(start_depth, depth), depth + 1):
+            result = self._aspiration_search(moves, current_depth, best_value)
+            if result is None:
+                break  # Budget ran out mid-iteration; keep the previous result
+            best_move, best_value, candidates = result
+            best_line = self.principal_variation()
+            completed_depth = current_depth
+            print(f"  depth {current_depth}: {best_move.uci()} (eval: {best_value:.1f}) "
+                  f"nodes {self.nodes_searched}, {budget.elapsed_ms():.0f}ms, "
+                  f"pv {' '.join(move.uci() for move in best_line)}")
+            # The next iteration starts from this iteration's best move
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+            if budget.stopped or best_value > MATE_THRESHOLD:
+                break  # Out of budget, or a forced mate is already found
         
-        for i, move in enumerate(moves[:search_moves]):
-            temp_board = copy.deepcopy(self.board)
-            piece = temp_board.squares[move.initial.row][move.initial.col].piece
-            temp_board.move(piece, move, testing=True)
-            
-            temp_ai = ChessAI(temp_board, self.opponent_color)
-            board_value = -temp_ai.minimax(depth - 1, -float('inf'), float('inf'), True)
-            
-            # Add randomness for variety (small amount)
-            board_value += random.uniform(-5, 5)
+        elapsed_ms = budget.elapsed_ms()
+        self.search_stats = {
+            'depth': completed_depth,
+            'nodes': self.nodes_searched,
+            'time_ms': round(elapsed_ms, 1),
+            'nps': int(self.nodes_searched * 1000 / elapsed_ms) if elapsed_ms else 0,
+            'aborted': budget.stopped,
+            'eval': best_value,
+            'pv': [move.uci() for move in best_line],
+            'candidates': len(candidates),
+        }
+        
+        if best_value is not None and best_value < MATE_THRESHOLD:
+            best_move = self._pick_root_move(candidates)
+        print(f"  [{moves.index(best_move) + 1}] {best_move.uci()}: {self._describe_move(best_move)}")
+        print(f"\nBest move selected: {best_move.uci()}")
+        print(f"Search: depth {completed_depth}, {self.nodes_searched} nodes in {elapsed_ms:.0f}ms"
+              + (f", evaluation {best_value:.1f}" if best_value is not None else ""))
+        
+        return best_move
+
+    def _parallel_search(self, depth, time_limit_ms, node_limit):
+        """Lazy SMP: workers - 1 helper processes search the same position under
+        the same limits while this process searches too. They all read and write
+        the shared transposition table, so each profits from the others'
+        results. The deepest completed search supplies the move; on a tie this
+        process's own pick (with its root variety) is kept."""
+        table, shm = _shared_memory_table
+        helpers = self.workers - 1
+        fen = self.board.to_fen()
+        deadline = None
+        if time_limit_ms is not None:
+            deadline = time.time() + (time_limit_ms + HELPER_GRACE_MS) / 1000
+        # The pool starts its processes as tasks are submitted
+        with _worker_lock, _main_script_hidden():
+            pool = _helper_pool(helpers)
+            futures = [pool.submit(_helper_search, shm.name, table.age, fen, self.color, depth,
+                                   time_limit_ms, node_limit, self.pruning, index)
+                       for index in range(1, helpers + 1)]
+        
+        best_move = self.search(depth, time_limit_ms, node_limit)
+        stats = self.search_stats
+        nodes = stats.get('nodes', 0)
+        for future in futures:
+            timeout = None if deadline is None else max(deadline - time.time(), 0)
+            try:
+                code, helper_depth, helper_eval, helper_nodes = future.result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                print("Search helper timed out")
+                continue
+            except Exception as e:
+                print(f"Search helper failed: {e}")
+                continue
+            nodes += helper_nodes
+            if code is not None and helper_depth > stats.get('depth', 0):
+                for move in self.get_all_moves(self.color):
+                    if move.code == code:
+                        best_move = move
+                        stats.update(depth=helper_depth, eval=helper_eval, pv=[move.uci()])
+                        break
+        
+        stats['nodes'] = nodes
+        stats['workers'] = self.workers
+        if stats.get('time_ms'):
+            stats['nps'] = int(nodes * 1000 / stats['time_ms'])
+        print(f"Parallel search: {self.workers} workers, depth {stats.get('depth')}, {nodes} nodes")
+        return best_move
+
+    def _aspiration_search(self, moves, depth, guess):
+        """Root search in a window around guess, widened and repeated until the
+        score lands inside it. None if the budget ran out."""
+        if guess is None or abs(guess) > MATE_THRESHOLD:
+            return self._search_root(moves, depth, -float('inf'), float('inf'))
+        
+        delta = ASPIRATION_WINDOW
+        alpha, beta = guess - delta, guess + delta
+        while True:
+            result = self._search_root(moves, depth, alpha, beta)
+            if result is None:
+                return None
+            score = result[1]
+            if alpha < score < beta:
+                return result
+            delta *= 4
+            if score <= alpha:
+                alpha = guess - delta if delta < MATE_THRESHOLD else -float('inf')
+            else:
+                beta = guess + delta if delta < MATE_THRESHOLD else float('inf')
+
+    def _search_root(self, moves, depth, alpha, beta):
+        """One fixed-depth pass over the root moves in the window (alpha, beta).
+
+        Returns (best move, score, candidates) or None if the budget ran out.
+        candidates are the (move, exact score) pairs within variety_margin of
+        the best: the zero windows of the later moves sit that margin below the
+        best score, so exactly those moves get a full re-search.
+        """
+        self.pv_length[0] = 0
+        margin = self.variety_margin
+        best_move = None
+        best_score = -float('inf')
+        scores = []
+        for move in moves:
+            undo = self.board.make_move(move)
+            if best_move is None:
+                score = -self.negamax(depth - 1, -beta, -alpha, self.opponent_color, 1)
+            else:
+                bound = max(alpha, best_score - margin)
+                score = -self.negamax(depth - 1, -bound - 1, -bound, self.opponent_color, 1)
+                if bound < score < beta:
+                    score = -self.negamax(depth - 1, -beta, -bound, self.opponent_color, 1)
+            self.board.unmake_move(undo)
+            if self.budget is not None and self.budget.stopped:
+                return None
             
-            if board_value > best_value:
-                best_value = board_value
+            scores.append((move, score))
+            if score > best_score:
+                best_score = score
                 best_move = move
-                
-                # Get move description
-                from_square = f"{chr(97 + move.initial.col)}{8 - move.initial.row}"
-                to_square = f"{chr(97 + move.final.col)}{8 - move.final.row}"
-                piece_name = piece.name.capitalize()
-                
-                # Determine move type
-                target = self.board.squares[move.final.row][move.final.col].piece
-                if target:
-                    move_type = f"ATTACKING - {piece_name} captures {target.name}"
-                elif self.is_piece_hanging(move.initial.row, move.initial.col):
-                    move_type = f"DEFENSIVE - {piece_name} moves to safety"
-                else:
-                    # Check if this move attacks opponent pieces
-                    temp_board2 = copy.deepcopy(self.board)
-                    temp_piece2 = temp_board2.squares[move.initial.row][move.initial.col].piece
-                    temp_board2.move(temp_piece2, move, testing=True)
-                    
-                    attacks_enemy = False
-                    temp_board2.calc_moves(temp_piece2, move.final.row, move.final.col, bool=False)
-                    for m in temp_piece2.moves:
-                        if temp_board2.squares[m.final.row][m.final.col].piece:
-                            attacks_enemy = True
-                            break
-                    
-                    if attacks_enemy:
-                        move_type = f"AGGRESSIVE - {piece_name} attacks enemy position"
-                    elif temp_board2.in_check_king(self.opponent_color):
-                        move_type = f"ATTACKING - {piece_name} gives check!"
-                    else:
-                        move_type = f"POSITIONAL - {piece_name} improves position"
-                
-                print(f"  [{i+1}] {from_square}->{to_square}: {move_type} (eval: {board_value:.1f})")
+                self._update_pv(0, move)
+                if score >= beta:
+                    break
+        
+        threshold = max(alpha, best_score - margin)
+        candidates = [(move, score) for move, score in scores
+                      if score > threshold and move != best_move]
+        candidates.insert(0, (best_move, best_score))
+        return best_move, best_score, candidates
+
+    def _pick_root_move(self, candidates):
+        """Play one of the near-best root moves, for variety: each score gets seeded
+        noise of up to half the variety margin and the highest wins"""
+        if len(candidates) == 1:
+            return candidates[0][0]
+        spread = self.variety_margin / 2
+        return max(candidates, key=lambda item: item[1] + self.rng.uniform(-spread, spread))[0]
+
+    def _describe_move(self, move):
+        """Short log description of why a move looks attractive"""
+        piece = self.board.squares[move.initial.row][move.initial.col].piece
+        piece_name = piece.name.capitalize()
+        
+        target = self.board.squares[move.final.row][move.final.col].piece
+        if target:
+            return f"ATTACKING - {piece_name} captures {target.name}"
+        if self.is_piece_hanging(move.initial.row, move.initial.col):
+            return f"DEFENSIVE - {piece_name} moves to safety"
         
-        if best_move:
-            from_square = f"{chr(97 + best_move.initial.col)}{8 - best_move.initial.row}"
-            to_square = f"{chr(97 + best_move.final.col)}{8 - best_move.final.row}"
-            print(f"\nBest move selected: {from_square}->{to_square}")
-            print(f"Nodes searched: {self.nodes_searched}, Evaluation: {best_value:.1f}")
+        # Check if this move attacks opponent pieces
+        undo = self.board.make_move(move)
+        moved_piece = self.board.squares[move.final.row][move.final.col].piece
+        
+        attacks_enemy = False
+        self.board.calc_moves(moved_piece, move.final.row, move.final.col, bool=False)
+        for m in moved_piece.moves:
+            if self.board.squares[m.final.row][m.final.col].piece:
+                attacks_enemy = True
+                break
+        moved_piece.clear_moves()
+        gives_check = self.board.in_check_king(self.opponent_color)
+        self.board.unmake_move(undo)
         
-        return best_move
\ No newline at end of file
+        if attacks_enemy:
+            return f"AGGRESSIVE - {piece_name} attacks enemy position"
+        if gives_check:
+            return f"ATTACKING - {piece_name} gives check!"
+        return f"POSITIONAL - {piece_name} improves position"
@@ -36,7 +36,7 @@ class GameAnalyzer:
         try:
             # Reconstruct the game
             board = Board()
-            player = 'white'
+            player = board.turn
             move_count = {'white': 0, 'black': 0}
             
             piece_values = {
@@ -69,7 +69,7 @@ class GameAnalyzer:
                     # Calculate move to make it on the board
                     initial = Square(initial_row, initial_col)
                     final = Square(final_row, final_col)
-                    move = Move(initial, final)
+                    move = Move(initial, final, move_data.get('promotion'))
                     
                     # Evaluate the move heuristically
                     move_quality = self._evaluate_move_quality(
@@ -195,41 +195,7 @@ class GameAnalyzer:
     
     def _is_square_attacked(self, board, row, col, by_color):
         """Check if a square is attacked by a specific color"""
-        # Simplified attack detection
-        directions = [(-1,-1), (-1,0), (-1,1), (0,-1), (0,1), (1,-1), (1,0), (1,1)]
-        knight_moves = [(-2,-1), (-2,1), (-1,-2), (-1,2), (1,-2), (1,2), (2,-1), (2,1)]
-        
-        # Check knight attacks
-        for dr, dc in knight_moves:
-            r, c = row + dr, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                piece = board.squares[r][c].piece
-                if piece and piece.name == 'knight' and piece.color == by_color:
-                    return True
-        
-        # Check sliding pieces
-        for dr, dc in directions:
-            for dist in range(1, 8):
-                r, c = row + dr * dist, col + dc * dist
-                if not (0 <= r < 8 and 0 <= c < 8):
-                    break
-                piece = board.squares[r][c].piece
-                if piece:
-                    if piece.color == by_color:
-                        if piece.name in ['queen', 'rook', 'bishop', 'king']:
-                            return True
-                    break
-        
-        # Check pawn attacks
-        pawn_direction = -1 if by_color == 'white' else 1
-        for dc in [-1, 1]:
-            r, c = row + pawn_direction, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                piece = board.squares[r][c].piece
-                if piece and piece.name == 'pawn' and piece.color == by_color:
-                    return True
-        
-        return False
+        return board.is_square_attacked(row, col, by_color)
 
     def analyze(self):
         """Main analysis function - tries Stockfish first, falls back to heuristic"""
@@ -257,31 +223,34 @@ class GameAnalyzer:
             'black': {'blunders': 0, 'mistakes': 0, 'inaccuracies': 0, 'good': 0, 'excellents': 0, 'avg_cp_loss': 0}
         }
         
-        board = chess.Board()
-        player = 'white'
+        # Replay on our own board and hand Stockfish each position as FEN
+        board = Board()
+        player = board.turn
         cp_losses = {'white': [], 'black': []}
         
-        for move in self.moves_history:
+        for move_data in self.moves_history:
+            initial = Square(move_data['initial']['row'], move_data['initial']['col'])
+            final = Square(move_data['final']['row'], move_data['final']['col'])
+            move = Move(initial, final, move_data.get('promotion'))
+            uci_move = move.uci()
+            piece = board.squares[initial.row][initial.col].piece
+            if piece is None:
+                print(f"Analysis stopped: no piece for move {uci_move}")
+                break
+            
             try:
-                initial_col = chr(ord('a') + move['initial']['col'])
-                initial_row = 8 - move['initial']['row']
-                final_col = chr(ord('a') + move['final']['col'])
-                final_row = 8 - move['final']['row']
-                uci_move = f"{initial_col}{initial_row}{final_col}{final_row}"
-                
                 # Analyze position before move
-                info = self.engine.analyse(board, chess.engine.Limit(time=0.1, depth=12))
+                position = chess.Board(board.to_fen())
+                info = self.engine.analyse(position, chess.engine.Limit(time=0.1, depth=12))
                 best_move = info["pv"][0].uci() if info.get("pv") else None
                 best_score = info["score"].relative.score(mate_score=10000) if info.get("score") else 0
                 
                 if uci_move == best_move:
                     analysis[player]['excellents'] += 1
                 else:
-                    # Make the move
-                    board.push_uci(uci_move)
-                    
                     # Analyze position after move
-                    info_after = self.engine.analyse(board, chess.engine.Limit(time=0.1, depth=12))
+                    position.push_uci(uci_move)
+                    info_after = self.engine.analyse(position, chess.engine.Limit(time=0.1, depth=12))
                     after_score = info_after["score"].relative.score(mate_score=10000) if info_after.get("score") else 0
                     
                     cp_loss = abs((best_score or 0) - (after_score or 0))
@@ -298,18 +267,11 @@ class GameAnalyzer:
                     else:
                         analysis[player]['excellents'] += 1
                 
-                if board.is_legal(chess.Move.from_uci(uci_move)):
-                    player = 'black' if player == 'white' else 'white'
-                
             except Exception as e:
                 print(f"Analysis error on move {uci_move}: {e}")
-                # Try to continue
-                try:
-                    board.push_uci(uci_move)
-                    player = 'black' if player == 'white' else 'white'
-                except:
-                    pass
-                continue
+            
+            board.move(piece, move, testing=True)
+            player = 'black' if player == 'white' else 'white'
         
         # Calculate average CP loss
         for color in ['white', 'black']:
@@ -13,13 +13,13 @@ import copy
 
 # Ensure chess_logic has the correct classes
 try:
-    from chess_logic import Board, Square, Move, Pawn, King, Rook
+    from chess_logic import Board, Square, Move, Pawn, King, Rook, PROMOTION_PIECES
 except ImportError:
     print("Warning: Could not import all classes from chess_logic.py. Assuming basic imports.")
-    from chess_logic import Board, Square, Move, Pawn
+    from chess_logic import Board, Square, Move, Pawn, PROMOTION_PIECES
     
 from models import db, User, Game
-from ai import ChessAI
+from ai import ChessAI, difficulty_settings, pruning_settings
 from analysis import GameAnalyzer
 
 
@@ -29,6 +29,8 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///chess.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024
+# Processes the bot searches with (1 = search in the request thread only)
+app.config['BOT_SEARCH_WORKERS'] = int(os.environ.get('BOT_SEARCH_WORKERS', 1))
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
 
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -362,6 +364,7 @@ def get_game_state(game_id):
     game = games[game_id]
     return jsonify({
         'board': game['board'].to_dict(),
+        'fen': game['board'].to_fen(),
         'next_player': game['next_player'],
         'captured_pieces': game['captured_pieces'],
         'game_type': game['type'],
@@ -398,7 +401,9 @@ def api_select_square():
     board.calc_moves(piece, row, col)
     game['selected'] = {'row': row, 'col': col, 'piece': piece}
     
-    valid_moves = [{'row': m.final.row, 'col': m.final.col} for m in piece.moves]
+    # Promotions come in four flavours per square; list each target square once
+    valid_moves = [{'row': m.final.row, 'col': m.final.col} for m in piece.moves
+                   if m.promotion in (None, 'queen')]
     return jsonify({'valid_moves': valid_moves, 'selected': {'row': row, 'col': col}})
 
 @app.route('/api/make_move', methods=['POST'])
@@ -426,14 +431,19 @@ def api_make_move():
     
     initial = Square(selected['row'], selected['col'])
     final = Square(data['row'], data['col'])
-    move = Move(initial, final)
+    promotion = None
+    if isinstance(piece, Pawn) and final.row in (0, 7):
+        promotion = data.get('promotion', 'queen')
+        if promotion not in PROMOTION_PIECES:
+            return jsonify({'error': 'Invalid promotion piece'}), 400
+    move = Move(initial, final, promotion)
     
     if move not in piece.moves:
         return jsonify({'error': 'Invalid move'}), 400
     
-    # Save state for undo (deep copy before move)
+    # Save state for undo (board clone before move)
     game_state = {
-        'board': copy.deepcopy(board),
+        'board': board.clone(),
         'next_player': game['next_player'],
         'captured_pieces': copy.deepcopy(game['captured_pieces'])
     }
@@ -445,10 +455,6 @@ def api_make_move():
     
     board.move(piece, move)
     
-    if isinstance(piece, Pawn):
-        if abs(final.row - initial.row) == 2:
-            board.set_true_en_passant(piece)
-    
     previous_player = game['next_player']
     game['next_player'] = 'black' if game['next_player'] == 'white' else 'white'
     game['selected'] = None
@@ -468,7 +474,7 @@ def api_make_move():
     game_over = board.is_game_over(game['next_player'])
     
     if game_over:
-        winner = 'draw' if game_over == 'stalemate' else previous_player
+        winner = previous_player if game_over == 'checkmate' else 'draw'
         _save_game(game_id, winner)
         response_data['game_over'] = True
         response_data['result'] = game_over
@@ -489,17 +495,19 @@ def api_make_move():
                 board = game['board']
                 
                 try:
-                    ai = ChessAI(board, 'black')
-                    # Reduced depth for faster response: easy=2, medium=2, hard=3
-                    depth = 2 if game['difficulty'] <= 3 else 3
-                    print(f"Bot calculating move at depth {depth}...")
+                    # Search a copy: other requests read game['board'] while the bot thinks
+                    ai = ChessAI(board.clone(), 'black', workers=app.config['BOT_SEARCH_WORKERS'])
+                    # Difficulty picks a time budget, so latency stays predictable
+                    time_limit_ms, max_depth = difficulty_settings(game['difficulty'])
+                    ai.pruning = pruning_settings(game['difficulty'])
+                    print(f"Bot calculating move ({time_limit_ms}ms, up to depth {max_depth})...")
                     
-                    ai_move = ai.get_best_move(depth=depth)
+                    ai_move = ai.get_best_move(depth=max_depth, time_limit_ms=time_limit_ms)
                     
                     if ai_move:
                         # Save bot move state for undo
                         bot_state = {
-                            'board': copy.deepcopy(board),
+                            'board': board.clone(),
                             'next_player': game['next_player'],
                             'captured_pieces': copy.deepcopy(game['captured_pieces'])
                         }
@@ -522,12 +530,13 @@ def api_make_move():
                             'bot_move': {
                                 'initial': {'row': ai_move.initial.row, 'col': ai_move.initial.col},
                                 'final': {'row': ai_move.final.row, 'col': ai_move.final.col}
-                            }
+                            },
+                            'search_stats': ai.search_stats
                         }
                         
                         game_over_after_bot = board.is_game_over(game['next_player'])
                         if game_over_after_bot:
-                            winner = 'draw' if game_over_after_bot == 'stalemate' else 'black'
+                            winner = 'black' if game_over_after_bot == 'checkmate' else 'draw'
                             _save_game(current_game_id, winner)
                             bot_response['game_over'] = True
                             bot_response['result'] = game_over_after_bot
@@ -604,7 +613,7 @@ def api_undo_move():
             return jsonify({'error': 'No moves to undo'}), 400
     
     # Restore the board state
-    game['board'] = copy.deepcopy(last_state['board'])
+    game['board'] = last_state['board'].clone()
     game['next_player'] = last_state['next_player']
     game['captured_pieces'] = copy.deepcopy(last_state['captured_pieces'])
     game['selected'] = None
@@ -705,10 +714,13 @@ def _save_game(game_id, winner, resignation=False):
     # Convert move history to JSON format - FIXED
     moves_list = []
     for move in board.moves_history:
-        moves_list.append({
+        move_data = {
             'initial': {'row': move.initial.row, 'col': move.initial.col},
             'final': {'row': move.final.row, 'col': move.final.col}
-        })
+        }
+        if move.promotion:
+            move_data['promotion'] = move.promotion
+        moves_list.append(move_data)
     
     new_game = Game(
         player_white=game['players']['white'],
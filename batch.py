@@ -0,0 +1,204 @@
+# batch.py - Vectorized evaluation and move generation over many positions
+#
+# Positions are packed as an N x 64 array of piece codes (0 = empty, 1-6 white
+# pawn..king, 7-12 black pawn..king) using the Board square numbering
+# (sq = row * 8 + col, a8 = 0). Bitboards are uint64 arrays with the same
+# bit layout as chess_logic, so every operation here runs over all N
+# positions at once.
+import numpy as np
+
+from chess_logic import (Board, Square, Move, PIECE_NAMES, KNIGHT_ATTACKS, KING_ATTACKS,
+                         PAWN_ATTACKS, FULL_BOARD, NOT_FILE_A, NOT_FILE_H, MAX_PHASE,
+                         piece_square_scores)
+
+EMPTY = 0
+WHITE_CODES = {name: i + 1 for i, name in enumerate(PIECE_NAMES)}
+BLACK_CODES = {name: i + 7 for i, name in enumerate(PIECE_NAMES)}
+PIECE_CODES = {'white': WHITE_CODES, 'black': BLACK_CODES}
+
+_BITS = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+_KNIGHT = np.array(KNIGHT_ATTACKS, dtype=np.uint64)
+_KING = np.array(KING_ATTACKS, dtype=np.uint64)
+_PAWN = {color: np.array(PAWN_ATTACKS[color], dtype=np.uint64) for color in ('white', 'black')}
+_NOT_A = np.uint64(NOT_FILE_A)
+_NOT_H = np.uint64(NOT_FILE_H)
+_FULL = np.uint64(FULL_BOARD)
+
+# (shift, left?, wrap mask) for each ray direction; left shifts move towards h1
+_RAY_STEPS = {
+    'diagonal': ((9, False, _NOT_H), (7, False, _NOT_A), (7, True, _NOT_H), (9, True, _NOT_A)),
+    'straight': ((8, False, _FULL), (8, True, _FULL), (1, False, _NOT_H), (1, True, _NOT_A)),
+}
+
+
+def _build_pst():
+    """Per code and square score tables (white positive) and per code phase weights,
+    from the same data as the board's incremental score"""
+    middle = np.zeros((13, 64), dtype=np.int32)
+    end = np.zeros((13, 64), dtype=np.int32)
+    phase = np.zeros(13, dtype=np.int32)
+    for color, by_name in piece_square_scores().items():
+        for name, (mg, eg, weight) in by_name.items():
+            code = PIECE_CODES[color][name]
+            middle[code] = mg
+            end[code] = eg
+            phase[code] = weight
+    return middle, end, phase
+
+
+_PST = None
+
+
+def _pst():
+    global _PST
+    if _PST is None:
+        _PST = _build_pst()
+    return _PST
+
+
+class PositionBatch:
+    """N positions packed into arrays for vectorized scoring and move generation"""
+
+    def __init__(self, codes, white_to_move=None, ep_squares=None):
+        self.codes = np.asarray(codes, dtype=np.int8).reshape(-1, 64)
+        n = len(self.codes)
+        self.white_to_move = (np.ones(n, dtype=bool) if white_to_move is None
+                              else np.asarray(white_to_move, dtype=bool))
+        # En passant target square per position, -1 when there is none
+        self.ep_squares = (np.full(n, -1, dtype=np.int8) if ep_squares is None
+                           else np.asarray(ep_squares, dtype=np.int8))
+
+    def __len__(self):
+        return len(self.codes)
+
+    @classmethod
+    def from_boards(cls, boards):
+        codes = np.zeros((len(boards), 64), dtype=np.int8)
+        white_to_move = np.zeros(len(boards), dtype=bool)
+        ep_squares = np.full(len(boards), -1, dtype=np.int8)
+        for i, board in enumerate(boards):
+            row_codes = codes[i]
+            for color, boards_by_name in board.bitboards.items():
+                for name, bb in boards_by_name.items():
+                    code = PIECE_CODES[color][name]
+                    while bb:
+                        low = bb & -bb
+                        row_codes[low.bit_length() - 1] = code
+                        bb ^= low
+            white_to_move[i] = board.turn == 'white'
+            if board.ep_square is not None:
+                ep_squares[i] = board.ep_square
+        return cls(codes, white_to_move, ep_squares)
+
+    @classmethod
+    def from_fens(cls, fens):
+        return cls.from_boards([Board.from_fen(fen) for fen in fens])
+
+    @classmethod
+    def from_game(cls, moves_history):
+        """Every position of a saved game (the JSON move list stored in Game.moves)"""
+        board = Board()
+        boards = [board.clone()]
+        for move_data in moves_history:
+            initial = Square(move_data['initial']['row'], move_data['initial']['col'])
+            final = Square(move_data['final']['row'], move_data['final']['col'])
+            piece = board.squares[initial.row][initial.col].piece
+            if piece is None:
+                break
+            board.move(piece, Move(initial, final, move_data.get('promotion')), testing=True)
+            boards.append(board.clone())
+        return cls.from_boards(boards)
+
+    def bitboards(self):
+        """N x 13 uint64 array: one bitboard per piece code (index 0 holds the empty squares)"""
+        onehot = self.codes[:, None, :] == np.arange(13, dtype=np.int8)[None, :, None]
+        return np.bitwise_or.reduce(np.where(onehot, _BITS, np.uint64(0)), axis=2)
+
+    def is_endgame(self):
+        """Vectorized ChessAI.is_endgame: at most 6 non-king pieces or no queens"""
+        codes = self.codes
+        kings = (codes == WHITE_CODES['king']) | (codes == BLACK_CODES['king'])
+        pieces = np.count_nonzero((codes != EMPTY) & ~kings, axis=1)
+        queens = np.count_nonzero((codes == WHITE_CODES['queen']) | (codes == BLACK_CODES['queen']),
+                                  axis=1)
+        return (pieces <= 6) | (queens == 0)
+
+    def material_pst(self):
+        """Material plus piece-square score per position, positive for white.
+
+        Matches Board.material_score: middle and end game scores blended by
+        the game phase.
+        """
+        middle, end, weights = _pst()
+        squares = np.arange(64)
+        mg = middle[self.codes, squares].sum(axis=1)
+        eg = end[self.codes, squares].sum(axis=1)
+        phase = np.minimum(weights[self.codes].sum(axis=1), MAX_PHASE)
+        return (mg * phase + eg * (MAX_PHASE - phase)) / MAX_PHASE
+
+    def pseudo_legal_targets(self):
+        """N x 64 uint64 array: destination bitboard of the side to move's piece on each square.
+
+        Pawn pushes, double pushes, captures and en passant are included;
+        castling is not, and a promotion counts as one target. Moves leaving
+        the king in check are not filtered out.
+        """
+        planes = self.bitboards()
+        white_occ = np.bitwise_or.reduce(planes[:, 1:7], axis=1)
+        black_occ = np.bitwise_or.reduce(planes[:, 7:13], axis=1)
+        white = self.white_to_move
+        own = np.where(white, white_occ, black_occ)[:, None]
+        enemy = np.where(white, black_occ, white_occ)[:, None]
+        occupied = (white_occ | black_occ)[:, None]
+        empty = ~occupied
+
+        codes = self.codes
+        offset = np.where(white, 0, 6).astype(np.int8)[:, None]
+        kind = np.where((codes != EMPTY) & (((codes - 1) // 6) == np.where(white, 0, 1)[:, None]),
+                        codes - offset, 0)
+        square_bits = np.broadcast_to(_BITS, codes.shape)
+        targets = np.zeros(codes.shape, dtype=np.uint64)
+
+        # Knights and kings: table lookups
+        targets |= np.where(kind == WHITE_CODES['knight'], _KNIGHT, np.uint64(0))
+        targets |= np.where(kind == WHITE_CODES['king'], _KING, np.uint64(0))
+
+        # Sliders: flood each piece's rays until the first blocker (inclusive)
+        for ray, movers in (('diagonal', (WHITE_CODES['bishop'], WHITE_CODES['queen'])),
+                            ('straight', (WHITE_CODES['rook'], WHITE_CODES['queen']))):
+            sources = np.where(np.isin(kind, movers), square_bits, np.uint64(0))
+            for shift, left, wrap in _RAY_STEPS[ray]:
+                shift = np.uint64(shift)
+                gen = sources
+                for _ in range(7):
+                    gen = ((gen << shift) if left else (gen >> shift)) & wrap
+                    targets |= gen
+                    gen = gen & empty
+
+        targets &= ~own
+
+        # Pawns: pushes onto empty squares, captures onto enemies or the en passant square
+        ep = self.ep_squares.astype(np.int64)
+        ep_bit = np.where(ep >= 0, _BITS[np.clip(ep, 0, 63)], np.uint64(0))[:, None]
+        pawns = kind == WHITE_CODES['pawn']
+        eight = np.uint64(8)
+        single = np.where(white[:, None], square_bits >> eight, square_bits << eight) & empty
+        start_rank = np.where(white[:, None], np.arange(64) // 8 == 6, np.arange(64) // 8 == 1)
+        double = np.where(white[:, None], single >> eight, single << eight) & empty
+        pushes = single | np.where(start_rank, double, np.uint64(0))
+        attacks = np.where(white[:, None], _PAWN['white'], _PAWN['black']) & (enemy | ep_bit)
+        targets = np.where(pawns, pushes | attacks, targets)
+
+        return np.where(kind != EMPTY, targets, np.uint64(0))
+
+    def move_masks(self):
+        """N x 64 x 64 boolean array: [n, from, to] is a pseudo-legal move"""
+        targets = self.pseudo_legal_targets()
+        # Little-endian bytes so that bit k of each bitboard lands at index k
+        bits = np.unpackbits(targets.astype('<u8', copy=False).view(np.uint8), bitorder='little')
+        return bits.reshape(len(self), 64, 64).astype(bool)
+
+    def move_counts(self):
+        """Pseudo-legal move count per position (see pseudo_legal_targets)"""
+        targets = self.pseudo_legal_targets()
+        return np.unpackbits(targets.view(np.uint8), axis=1).sum(axis=1)
@@ -0,0 +1,112 @@
+# benchmark.py - Move generator perft checks and speed measurements
+import argparse
+import copy
+import sys
+import time
+import timeit
+
+from chess_logic import Board, START_FEN
+
+
+# Standard perft positions with their known node counts per depth
+POSITIONS = {
+    'startpos': (START_FEN, [20, 400, 8902, 197281, 4865609]),
+    'kiwipete': ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+                 [48, 2039, 97862, 4085603]),
+    'position3': ('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+                  [14, 191, 2812, 43238, 674624]),
+    'position4': ('r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+                  [6, 264, 9467, 422333]),
+    'position5': ('rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+                  [44, 1486, 62379, 2103487]),
+    'position6': ('r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+                  [46, 2079, 89890, 3894594]),
+}
+
+
+def run_perft(name, fen, depth, expected=None):
+    """Run perft on one position and print nodes, time and nodes per second"""
+    board = Board.from_fen(fen)
+    start = time.perf_counter()
+    nodes = board.perft(depth)
+    elapsed = time.perf_counter() - start
+    nps = nodes / elapsed if elapsed > 0 else 0.0
+
+    if expected is None:
+        status = ''
+    elif nodes == expected:
+        status = 'ok'
+    else:
+        status = f'MISMATCH (expected {expected})'
+    print(f'{name:<10} depth {depth}  {nodes:>10} nodes  {elapsed:8.3f}s  {nps:>10.0f} nps  {status}')
+    return expected is None or nodes == expected
+
+
+def cmd_perft(args):
+    if args.fen:
+        return run_perft('fen', args.fen, args.depth)
+
+    names = [args.position] if args.position else list(POSITIONS)
+    ok = True
+    for name in names:
+        fen, counts = POSITIONS[name]
+        expected = counts[args.depth - 1] if args.depth <= len(counts) else None
+        ok = run_perft(name, fen, args.depth, expected) and ok
+    return ok
+
+
+def cmd_divide(args):
+    fen = args.fen or POSITIONS[args.position or 'startpos'][0]
+    board = Board.from_fen(fen)
+    counts = board.divide(args.depth)
+    for uci in sorted(counts):
+        print(f'{uci}: {counts[uci]}')
+    print(f'\nMoves: {len(counts)}')
+    print(f'Nodes: {sum(counts.values())}')
+    return True
+
+
+def cmd_clone(args):
+    """Time Board.clone() against copy.deepcopy for snapshotting a position"""
+    if args.fen:
+        positions = [('fen', args.fen)]
+    else:
+        names = [args.position] if args.position else list(POSITIONS)
+        positions = [(name, POSITIONS[name][0]) for name in names]
+
+    for name, fen in positions:
+        board = Board.from_fen(fen)
+        clone_time = min(timeit.repeat(board.clone, number=args.number, repeat=3)) / args.number
+        deepcopy_time = min(timeit.repeat(lambda: copy.deepcopy(board), number=args.number,
+                                          repeat=3)) / args.number
+        print(f'{name:<10} clone {clone_time * 1e6:8.1f}us  deepcopy {deepcopy_time * 1e6:8.1f}us  '
+              f'speedup {deepcopy_time / clone_time:5.1f}x')
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Chess engine benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for command, handler, help_text in (('perft', cmd_perft, 'count leaf nodes against reference values'),
+                                        ('divide', cmd_divide, 'perft split by root move')):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument('--depth', type=int, default=3)
+        sub.add_argument('--position', choices=sorted(POSITIONS))
+        sub.add_argument('--fen', help='custom position instead of the standard set')
+        sub.set_defaults(handler=handler)
+
+    sub = subparsers.add_parser('clone', help='Board.clone() against copy.deepcopy')
+    sub.add_argument('--position', choices=sorted(POSITIONS))
+    sub.add_argument('--fen', help='custom position instead of the standard set')
+    sub.add_argument('--number', type=int, default=200, help='copies per timing run')
+    sub.set_defaults(handler=cmd_clone, depth=1)
+
+    args = parser.parse_args(argv)
+    if args.depth < 1:
+        parser.error('--depth must be at least 1')
+    return 0 if args.handler(args) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -407,24 +407,318 @@
 #         return False
 
 # chess_logic.py - OPTIMIZED VERSION
-import copy
+import random
 
 ROWS = 8
 COLS = 8
 
+# Bitboard layout: bit (row * 8 + col), so bit 0 is a8 and bit 63 is h1.
+# Shifting left by 8 moves a square one row down (towards white's side).
+FULL_BOARD = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_B = FILE_A << 1
+FILE_G = FILE_A << 6
+FILE_H = FILE_A << 7
+NOT_FILE_A = FULL_BOARD ^ FILE_A
+NOT_FILE_H = FULL_BOARD ^ FILE_H
+NOT_FILE_AB = FULL_BOARD ^ (FILE_A | FILE_B)
+NOT_FILE_GH = FULL_BOARD ^ (FILE_G | FILE_H)
+LIGHT_SQUARES = sum(1 << sq for sq in range(64) if ((sq >> 3) + (sq & 7)) % 2 == 0)
+DARK_SQUARES = FULL_BOARD ^ LIGHT_SQUARES
+
+PIECE_NAMES = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+
+# Castling rights bits
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+ALL_CASTLING = 15
+
+# FEN castling letters: (letter, right, color, king row, rook column)
+CASTLING_FEN = (('K', WHITE_KINGSIDE, 'white', 7, 7), ('Q', WHITE_QUEENSIDE, 'white', 7, 0),
+                ('k', BLACK_KINGSIDE, 'black', 0, 7), ('q', BLACK_QUEENSIDE, 'black', 0, 0))
+
+# Rights still held after a move from or to each square (king and rook homes lose some)
+CASTLING_MASKS = [ALL_CASTLING] * 64
+for _sq, _lost in ((60, WHITE_KINGSIDE | WHITE_QUEENSIDE), (63, WHITE_KINGSIDE), (56, WHITE_QUEENSIDE),
+                   (4, BLACK_KINGSIDE | BLACK_QUEENSIDE), (7, BLACK_KINGSIDE), (0, BLACK_QUEENSIDE)):
+    CASTLING_MASKS[_sq] = ALL_CASTLING ^ _lost
+
+# Zobrist keys, seeded so every process hashes positions identically
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_PIECES = {color: {name: [_zobrist_random.getrandbits(64) for _ in range(64)]
+                          for name in PIECE_NAMES}
+                  for color in ('white', 'black')}
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_EN_PASSANT = [_zobrist_random.getrandbits(64) for _ in range(8)]
+
+# Ray directions as (row step, col step); a direction is "positive" when it
+# walks towards higher square indices, so its nearest blocker is the lowest bit
+DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1), (-1, 0), (1, 0), (0, -1), (0, 1))
+DIAGONAL_DIRECTIONS = (0, 1, 2, 3)
+STRAIGHT_DIRECTIONS = (4, 5, 6, 7)
+POSITIVE_DIRECTION = tuple(dr > 0 or (dr == 0 and dc > 0) for dr, dc in DIRECTIONS)
+
+
+def square_bit(row, col):
+    return 1 << (row * 8 + col)
+
+
+def iter_bits(bb):
+    """Yield the index of every set bit, lowest first"""
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+def knight_attacks(bb):
+    return (((bb << 17) & NOT_FILE_A) | ((bb << 15) & NOT_FILE_H) |
+            ((bb << 10) & NOT_FILE_AB) | ((bb << 6) & NOT_FILE_GH) |
+            ((bb >> 17) & NOT_FILE_H) | ((bb >> 15) & NOT_FILE_A) |
+            ((bb >> 10) & NOT_FILE_GH) | ((bb >> 6) & NOT_FILE_AB)) & FULL_BOARD
+
+
+def king_attacks(bb):
+    sideways = ((bb << 1) & NOT_FILE_A) | ((bb >> 1) & NOT_FILE_H)
+    row = bb | sideways
+    return (sideways | (row << 8) | (row >> 8)) & FULL_BOARD
+
+
+def pawn_attacks(bb, color):
+    if color == 'white':
+        return ((bb >> 9) & NOT_FILE_H) | ((bb >> 7) & NOT_FILE_A)
+    return (((bb << 7) & NOT_FILE_H) | ((bb << 9) & NOT_FILE_A)) & FULL_BOARD
+
+
+def _build_tables():
+    """Attack and ray tables for every square, built once at import"""
+    def inside(row, col):
+        return 0 <= row < 8 and 0 <= col < 8
+
+    knight = [0] * 64
+    king = [0] * 64
+    pawn = {'white': [0] * 64, 'black': [0] * 64}
+    ray_masks = [[0] * 64 for _ in DIRECTIONS]
+
+    for sq in range(64):
+        row, col = sq >> 3, sq & 7
+        for dr, dc in ((-2, 1), (-1, 2), (1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1)):
+            if inside(row + dr, col + dc):
+                knight[sq] |= square_bit(row + dr, col + dc)
+        for index, (dr, dc) in enumerate(DIRECTIONS):
+            if inside(row + dr, col + dc):
+                king[sq] |= square_bit(row + dr, col + dc)
+            r, c = row + dr, col + dc
+            while inside(r, c):
+                ray_masks[index][sq] |= square_bit(r, c)
+                r += dr
+                c += dc
+        for color, dr in (('white', -1), ('black', 1)):
+            for dc in (-1, 1):
+                if inside(row + dr, col + dc):
+                    pawn[color][sq] |= square_bit(row + dr, col + dc)
+
+    return knight, king, pawn, ray_masks
+
+
+KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, RAY_MASKS = _build_tables()
+
+
+def ray_attacks(sq, directions, occupied):
+    """Squares a slider on sq reaches along directions, up to and including the first blocker"""
+    attacks = 0
+    for index in directions:
+        ray = RAY_MASKS[index][sq]
+        blocked = ray & occupied
+        if blocked:
+            if POSITIVE_DIRECTION[index]:
+                blocker = (blocked & -blocked).bit_length() - 1
+            else:
+                blocker = blocked.bit_length() - 1
+            ray ^= RAY_MASKS[index][blocker]
+        attacks |= ray
+    return attacks
+
+
+def bishop_attacks(sq, occupied):
+    return ray_attacks(sq, DIAGONAL_DIRECTIONS, occupied)
+
+
+def rook_attacks(sq, occupied):
+    return ray_attacks(sq, STRAIGHT_DIRECTIONS, occupied)
+
+
+def queen_attacks(sq, occupied):
+    return ray_attacks(sq, DIAGONAL_DIRECTIONS, occupied) | ray_attacks(sq, STRAIGHT_DIRECTIONS, occupied)
+
+
+# Empty-board lines through each square: a slider can only attack along these
+BISHOP_LINES = [bishop_attacks(sq, 0) for sq in range(64)]
+ROOK_LINES = [rook_attacks(sq, 0) for sq in range(64)]
+
+
+def piece_attacks(name, color, sq, occupied):
+    """Squares attacked by a single piece of the given name standing on sq"""
+    if name == 'pawn':
+        return PAWN_ATTACKS[color][sq]
+    if name == 'knight':
+        return KNIGHT_ATTACKS[sq]
+    if name == 'bishop':
+        return bishop_attacks(sq, occupied)
+    if name == 'rook':
+        return rook_attacks(sq, occupied)
+    if name == 'queen':
+        return queen_attacks(sq, occupied)
+    return KING_ATTACKS[sq]
+
+
+# Material values, shared by exchange evaluation here and the evaluator in ai.py
+piece_values = {
+    'pawn': 100,
+    'knight': 320,
+    'bishop': 330,
+    'rook': 500,
+    'queen': 900,
+    'king': 20000
+}
+
+# Enhanced position value tables (piece-square tables)
+pawn_table = [
+    [0,   0,   0,   0,   0,   0,   0,   0],
+    [50,  50,  50,  50,  50,  50,  50,  50],
+    [10,  10,  20,  30,  30,  20,  10,  10],
+    [5,   5,   10,  27,  27,  10,  5,   5],
+    [0,   0,   0,   25,  25,  0,   0,   0],
+    [5,   -5,  -10, 0,   0,   -10, -5,  5],
+    [5,   10,  10,  -25, -25, 10,  10,  5],
+    [0,   0,   0,   0,   0,   0,   0,   0]
+]
+
+knight_table = [
+    [-50, -40, -30, -30, -30, -30, -40, -50],
+    [-40, -20, 0,   0,   0,   0,   -20, -40],
+    [-30, 0,   10,  15,  15,  10,  0,   -30],
+    [-30, 5,   15,  20,  20,  15,  5,   -30],
+    [-30, 0,   15,  20,  20,  15,  0,   -30],
+    [-30, 5,   10,  15,  15,  10,  5,   -30],
+    [-40, -20, 0,   5,   5,   0,   -20, -40],
+    [-50, -40, -20, -30, -30, -20, -40, -50]
+]
+
+bishop_table = [
+    [-20, -10, -10, -10, -10, -10, -10, -20],
+    [-10, 0,   0,   0,   0,   0,   0,   -10],
+    [-10, 0,   5,   10,  10,  5,   0,   -10],
+    [-10, 5,   5,   10,  10,  5,   5,   -10],
+    [-10, 0,   10,  10,  10,  10,  0,   -10],
+    [-10, 10,  10,  10,  10,  10,  10,  -10],
+    [-10, 5,   0,   0,   0,   0,   5,   -10],
+    [-20, -10, -40, -10, -10, -40, -10, -20]
+]
+
+rook_table = [
+    [0,   0,   0,   0,   0,   0,   0,   0],
+    [5,   10,  10,  10,  10,  10,  10,  5],
+    [-5,  0,   0,   0,   0,   0,   0,   -5],
+    [-5,  0,   0,   0,   0,   0,   0,   -5],
+    [-5,  0,   0,   0,   0,   0,   0,   -5],
+    [-5,  0,   0,   0,   0,   0,   0,   -5],
+    [-5,  0,   0,   0,   0,   0,   0,   -5],
+    [0,   0,   0,   5,   5,   0,   0,   0]
+]
+
+queen_table = [
+    [-20, -10, -10, -5,  -5,  -10, -10, -20],
+    [-10, 0,   0,   0,   0,   0,   0,   -10],
+    [-10, 0,   5,   5,   5,   5,   0,   -10],
+    [-5,  0,   5,   5,   5,   5,   0,   -5],
+    [0,   0,   5,   5,   5,   5,   0,   -5],
+    [-10, 5,   5,   5,   5,   5,   0,   -10],
+    [-10, 0,   5,   0,   0,   0,   0,   -10],
+    [-20, -10, -10, -5,  -5,  -10, -10, -20]
+]
+
+king_middle_game = [
+    [-30, -40, -40, -50, -50, -40, -40, -30],
+    [-30, -40, -40, -50, -50, -40, -40, -30],
+    [-30, -40, -40, -50, -50, -40, -40, -30],
+    [-30, -40, -40, -50, -50, -40, -40, -30],
+    [-20, -30, -30, -40, -40, -30, -30, -20],
+    [-10, -20, -20, -20, -20, -20, -20, -10],
+    [20,  20,  0,   0,   0,   0,   20,  20],
+    [20,  30,  10,  0,   0,   10,  30,  20]
+]
+
+king_end_game = [
+    [-50, -40, -30, -20, -20, -30, -40, -50],
+    [-30, -20, -10, 0,   0,   -10, -20, -30],
+    [-30, -10, 20,  30,  30,  20,  -10, -30],
+    [-30, -10, 30,  40,  40,  30,  -10, -30],
+    [-30, -10, 30,  40,  40,  30,  -10, -30],
+    [-30, -10, 20,  30,  30,  20,  -10, -30],
+    [-30, -30, 0,   0,   0,   0,   -30, -30],
+    [-50, -30, -30, -30, -30, -30, -30, -50]
+]
+
+# Game phase weight per piece: MAX_PHASE with all minor and major pieces on the
+# board, 0 with bare kings and pawns. Blends the middle and end game scores.
+phase_weights = {'pawn': 0, 'knight': 1, 'bishop': 1, 'rook': 2, 'queen': 4, 'king': 0}
+MAX_PHASE = 24
+
+
+_piece_square_scores = None
+
+
+def piece_square_scores():
+    """Per color and piece name: (middle game, end game, phase weight) where the game
+    scores are 64-entry lists of material plus table bonus, positive for white.
+
+    Built from the values and tables above on first use.
+    """
+    global _piece_square_scores
+    if _piece_square_scores is None:
+        tables = {'pawn': pawn_table, 'knight': knight_table, 'bishop': bishop_table,
+                  'rook': rook_table, 'queen': queen_table, 'king': king_middle_game}
+        scores = {}
+        for color, sign in (('white', 1), ('black', -1)):
+            scores[color] = {}
+            for name in PIECE_NAMES:
+                middle, end = [], []
+                for sq in range(64):
+                    row, col = sq >> 3, sq & 7
+                    piece_row = row if color == 'white' else 7 - row
+                    value = piece_values[name] + tables[name][piece_row][col]
+                    middle.append(sign * value)
+                    if name == 'king':
+                        value = piece_values[name] + king_end_game[piece_row][col]
+                    end.append(sign * value)
+                scores[color][name] = (middle, end, phase_weights[name])
+        _piece_square_scores = scores
+    return _piece_square_scores
+
+
+def popcount(bb):
+    return bin(bb).count('1')
+
+
 class Piece:
+    __slots__ = ('name', 'color', 'value', 'moves', 'moved')
+
     def __init__(self, name, color, value):
         self.name = name
         self.color = color
         self.value = value * (1 if color == 'white' else -1)
-        self.moves = []
+        self.moves = set()
         self.moved = False
 
     def add_move(self, move):
-        self.moves.append(move)
+        self.moves.add(move)
 
     def clear_moves(self):
-        self.moves = []
+        self.moves.clear()
 
     def to_dict(self):
         return {
@@ -434,34 +728,44 @@ class Piece:
         }
 
 class Pawn(Piece):
+    __slots__ = ('dir',)
+
     def __init__(self, color):
         super().__init__('pawn', color, 1.0)
         self.dir = -1 if color == 'white' else 1
-        self.en_passant = False
 
 class Knight(Piece):
+    __slots__ = ()
+
     def __init__(self, color):
         super().__init__('knight', color, 3.0)
 
 class Bishop(Piece):
+    __slots__ = ()
+
     def __init__(self, color):
         super().__init__('bishop', color, 3.001)
 
 class Rook(Piece):
+    __slots__ = ()
+
     def __init__(self, color):
         super().__init__('rook', color, 5.0)
 
 class Queen(Piece):
+    __slots__ = ()
+
     def __init__(self, color):
         super().__init__('queen', color, 9.0)
 
 class King(Piece):
+    __slots__ = ()
+
     def __init__(self, color):
         super().__init__('king', color, 10000.0)
-        self.left_rook = None
-        self.right_rook = None
 
 class Square:
+    __slots__ = ('row', 'col', 'piece')
     ALPHACOLS = {0: 'a', 1: 'b', 2: 'c', 3: 'd', 4: 'e', 5: 'f', 6: 'g', 7: 'h'}
     
     def __init__(self, row, col, piece=None):
@@ -494,339 +798,773 @@ class Square:
     def to_dict(self):
         return {'row': self.row, 'col': self.col}
 
+# Shared coordinate-only squares used as move endpoints; never give them a piece
+SQUARES = tuple(Square(sq >> 3, sq & 7) for sq in range(64))
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+PROMOTION_CODES = {None: 0, 'knight': 1, 'bishop': 2, 'rook': 3, 'queen': 4}
+PROMOTION_PIECES = ('queen', 'rook', 'bishop', 'knight')
+PROMOTION_NAMES = {code: name for name, code in PROMOTION_CODES.items()}
+
 class Move:
-    def __init__(self, initial, final):
+    """A move between two squares, encoded as from | to << 6 | promotion << 12"""
+    __slots__ = ('initial', 'final', 'promotion', 'code')
+
+    def __init__(self, initial, final, promotion=None):
         self.initial = initial
         self.final = final
+        self.promotion = promotion
+        self.code = (initial.row * 8 + initial.col) | ((final.row * 8 + final.col) << 6) | \
+                    (PROMOTION_CODES[promotion] << 12)
+
+    @classmethod
+    def from_code(cls, code):
+        """Rebuild a move from its compact code (e.g. one stored in a hash table)"""
+        return cls(SQUARES[code & 63], SQUARES[(code >> 6) & 63], PROMOTION_NAMES[code >> 12])
 
     def __eq__(self, other):
-        return self.initial.row == other.initial.row and \
-               self.initial.col == other.initial.col and \
-               self.final.row == other.final.row and \
-               self.final.col == other.final.col
+        return isinstance(other, Move) and self.code == other.code
+
+    def __hash__(self):
+        return self.code
+
+    def uci(self):
+        """Long algebraic form such as 'e2e4' or 'e7e8n'"""
+        text = (Square.ALPHACOLS[self.initial.col] + str(8 - self.initial.row) +
+                Square.ALPHACOLS[self.final.col] + str(8 - self.final.row))
+        if self.promotion:
+            text += 'n' if self.promotion == 'knight' else self.promotion[0]
+        return text
                
     def to_dict(self):
         return {'initial': self.initial.to_dict(), 'final': self.final.to_dict()}
 
+class UndoInfo:
+    """State a make_move call overwrote, so unmake_move can restore it"""
+    __slots__ = ('move', 'piece', 'moved', 'last_move', 'captured', 'captured_row',
+                 'captured_col', 'promoted', 'king_position', 'rook', 'rook_moved', 'rook_cols',
+                 'hash', 'castling_rights', 'ep_square', 'halfmove_clock', 'position_cache')
+
+    def __init__(self, move, piece, moved, last_move, hash, castling_rights, ep_square,
+                 halfmove_clock):
+        self.move = move
+        self.piece = piece
+        self.moved = moved
+        self.last_move = last_move
+        self.hash = hash
+        self.castling_rights = castling_rights
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        self.captured = None
+        self.captured_row = None
+        self.captured_col = None
+        self.promoted = False
+        self.king_position = None
+        self.rook = None
+        self.rook_moved = False
+        self.rook_cols = None
+        self.position_cache = None
+
 class Board:
     def __init__(self):
+        self._clear()
+        self._add_pieces('white')
+        self._add_pieces('black')
+        self.castling_rights = ALL_CASTLING
+        self.hash = self.compute_hash()
+        self.start_fen = START_FEN
+
+    def _clear(self):
+        """Empty board with white to move and no castling rights"""
         self.squares = [[Square(row, col) for col in range(COLS)] for row in range(ROWS)]
         self.last_move = None
         self.moves_history = []
+        self.hash_history = []  # Keys of the positions before each move played, for repetitions
         self._king_positions = {'white': None, 'black': None}  # Cache king positions
-        self._add_pieces('white')
-        self._add_pieces('black')
-
-    def move(self, piece, move, testing=False):
+        # One bitboard per (color, piece name) plus per-color and total occupancy
+        self.bitboards = {color: dict.fromkeys(PIECE_NAMES, 0) for color in ('white', 'black')}
+        self.occupancy = {'white': 0, 'black': 0}
+        self.occupied = 0
+        self._position_cache = None  # Legality and attack data, dropped on any change
+        self.hash = 0
+        # Material plus piece-square score (white positive) for the middle and end
+        # game, and the phase they are blended by; updated with every piece placed
+        self._scores = piece_square_scores()
+        self.mg_score = 0
+        self.eg_score = 0
+        self.phase = 0
+        self.turn = 'white'
+        self.castling_rights = 0
+        self.ep_square = None  # Square skipped by the last double pawn push, if a pawn can take there
+        self.halfmove_clock = 0  # Plies since the last capture or pawn move
+        self.fullmove_number = 1
+
+    @classmethod
+    def from_fen(cls, fen):
+        """Set up a position from FEN; the clock fields are optional.
+
+        Raises ValueError for a malformed piece placement or side to move.
+        """
+        fields = fen.split()
+        ranks = fields[0].split('/') if fields else []
+        if len(ranks) != ROWS:
+            raise ValueError(f'FEN needs {ROWS} ranks: {fen!r}')
+        board = cls.__new__(cls)
+        board._clear()
+
+        for row, rank in enumerate(ranks):
+            col = 0
+            for char in rank:
+                if char.isdigit():
+                    col += int(char)
+                    continue
+                piece_class = FEN_PIECES.get(char.lower())
+                if piece_class is None or col >= COLS:
+                    raise ValueError(f'Bad FEN rank {rank!r}')
+                color = 'white' if char.isupper() else 'black'
+                piece = piece_class(color)
+                if piece_class is Pawn:
+                    piece.moved = row != (6 if color == 'white' else 1)
+                elif piece_class is King:
+                    board._king_positions[color] = (row, col)
+                board._put_piece(piece, row, col)  # Also XORs the piece into board.hash
+                col += 1
+            if col != COLS:
+                raise ValueError(f'Bad FEN rank {rank!r}')
+
+        turn = fields[1] if len(fields) > 1 else 'w'
+        if turn not in ('w', 'b'):
+            raise ValueError(f'Bad FEN side to move {turn!r}')
+        if turn == 'b':
+            board.turn = 'black'
+            board.hash ^= ZOBRIST_BLACK_TO_MOVE
+
+        # Only keep rights whose king and rook are actually on their home squares
+        castling = fields[2] if len(fields) > 2 else '-'
+        for char, right, color, row, rook_col in CASTLING_FEN:
+            king = board.squares[row][4].piece
+            rook = board.squares[row][rook_col].piece
+            if char in castling and isinstance(king, King) and king.color == color \
+                    and isinstance(rook, Rook) and rook.color == color:
+                board.castling_rights |= right
+        board.hash ^= ZOBRIST_CASTLING[board.castling_rights]
+
+        en_passant = fields[3] if len(fields) > 3 else '-'
+        if en_passant != '-':
+            # The skipped square is on rank 6 after a black double push, rank 3 after white's
+            ep_rank = '6' if turn == 'w' else '3'
+            if len(en_passant) != 2 or en_passant[0] not in 'abcdefgh' \
+                    or en_passant[1] != ep_rank:
+                raise ValueError(f'Bad FEN en passant square {en_passant!r}')
+            col = 'abcdefgh'.index(en_passant[0])
+            ep_square = (8 - int(en_passant[1])) * 8 + col
+            pusher = 'black' if board.turn == 'white' else 'white'
+            # Kept only if a pawn can take there, as make_move does
+            if PAWN_ATTACKS[pusher][ep_square] & board.bitboards[board.turn]['pawn']:
+                board.ep_square = ep_square
+                board.hash ^= ZOBRIST_EN_PASSANT[col]
+
+        for index, name, minimum in ((4, 'halfmove_clock', 0), (5, 'fullmove_number', 1)):
+            if len(fields) > index:
+                field = fields[index]
+                if not field.isdigit() or int(field) < minimum:
+                    raise ValueError(f'Bad FEN {name.replace("_", " ")} {field!r}')
+                setattr(board, name, int(field))
+        board.start_fen = board.to_fen()  # Position moves_history starts from
+        return board
+
+    def to_fen(self):
+        """FEN of the position with castling, en passant square and clocks (round-trips from_fen)"""
+        ranks = []
+        for row in self.squares:
+            rank = ''
+            empty = 0
+            for square in row:
+                piece = square.piece
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                char = FEN_CHARS[piece.name]
+                rank += char.upper() if piece.color == 'white' else char
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+
+        castling = ''.join(char for char, right, _, _, _ in CASTLING_FEN
+                           if self.castling_rights & right) or '-'
+        if self.ep_square is None:
+            en_passant = '-'
+        else:
+            en_passant = Square.ALPHACOLS[self.ep_square & 7] + str(8 - (self.ep_square >> 3))
+        turn = 'w' if self.turn == 'white' else 'b'
+        return (f"{'/'.join(ranks)} {turn} {castling} {en_passant} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
+
+    def clone(self):
+        """Independent copy of the position, rebuilt from the bitboards.
+
+        Far cheaper than copy.deepcopy: each piece is recreated from its type and
+        moved flag alone, with an empty moves set (calc_moves refills it), and the
+        bitboards, hash and clocks are plain values copied as they are.
+        """
+        board = self.__class__.__new__(self.__class__)
+        old_squares = self.squares
+        squares = [[Square(row, col) for col in range(COLS)] for row in range(ROWS)]
+        for color, boards in self.bitboards.items():
+            for name, bb in boards.items():
+                piece_class = PIECE_CLASSES[name]
+                for sq in iter_bits(bb):
+                    row, col = sq >> 3, sq & 7
+                    piece = piece_class(color)
+                    piece.moved = old_squares[row][col].piece.moved
+                    squares[row][col].piece = piece
+
+        board.squares = squares
+        board.bitboards = {color: dict(boards) for color, boards in self.bitboards.items()}
+        board.occupancy = dict(self.occupancy)
+        board.occupied = self.occupied
+        board._king_positions = dict(self._king_positions)
+        board._position_cache = None
+        board.last_move = self.last_move
+        board.moves_history = list(self.moves_history)
+        board.start_fen = self.start_fen
+        board.hash_history = list(self.hash_history)
+        board.hash = self.hash
+        board._scores = self._scores
+        board.mg_score = self.mg_score
+        board.eg_score = self.eg_score
+        board.phase = self.phase
+        board.turn = self.turn
+        board.castling_rights = self.castling_rights
+        board.ep_square = self.ep_square
+        board.halfmove_clock = self.halfmove_clock
+        board.fullmove_number = self.fullmove_number
+        return board
+
+    def compute_hash(self):
+        """Zobrist key of the position computed from scratch (verifies self.hash)"""
+        key = 0
+        for color, boards in self.bitboards.items():
+            for name, bb in boards.items():
+                table = ZOBRIST_PIECES[color][name]
+                for sq in iter_bits(bb):
+                    key ^= table[sq]
+        if self.turn == 'black':
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        key ^= ZOBRIST_CASTLING[self.castling_rights]
+        if self.ep_square is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.ep_square & 7]
+        return key
+
+    def material_score(self):
+        """Material plus piece-square score, positive for white, tapered by game phase"""
+        phase = min(self.phase, MAX_PHASE)
+        return (self.mg_score * phase + self.eg_score * (MAX_PHASE - phase)) / MAX_PHASE
+
+    def _put_piece(self, piece, row, col):
+        sq = row * 8 + col
+        bit = 1 << sq
+        self.squares[row][col].piece = piece
+        self._position_cache = None
+        self.hash ^= ZOBRIST_PIECES[piece.color][piece.name][sq]
+        middle, end, weight = self._scores[piece.color][piece.name]
+        self.mg_score += middle[sq]
+        self.eg_score += end[sq]
+        self.phase += weight
+        self.bitboards[piece.color][piece.name] |= bit
+        self.occupancy[piece.color] |= bit
+        self.occupied |= bit
+
+    def _remove_piece(self, row, col):
+        piece = self.squares[row][col].piece
+        if piece is not None:
+            sq = row * 8 + col
+            mask = FULL_BOARD ^ (1 << sq)
+            self.squares[row][col].piece = None
+            self._position_cache = None
+            self.hash ^= ZOBRIST_PIECES[piece.color][piece.name][sq]
+            middle, end, weight = self._scores[piece.color][piece.name]
+            self.mg_score -= middle[sq]
+            self.eg_score -= end[sq]
+            self.phase -= weight
+            self.bitboards[piece.color][piece.name] &= mask
+            self.occupancy[piece.color] &= mask
+            self.occupied &= mask
+        return piece
+
+    def make_move(self, move):
+        """Play a move in place and return the UndoInfo needed to take it back"""
         initial = move.initial
         final = move.final
+        piece = self.squares[initial.row][initial.col].piece
+        undo = UndoInfo(move, piece, piece.moved, self.last_move, self.hash,
+                        self.castling_rights, self.ep_square, self.halfmove_clock)
+        undo.position_cache = self._position_cache
+        self.hash_history.append(self.hash)
 
-        en_passant_empty = self.squares[final.row][final.col].isempty()
-
-        self.squares[initial.row][initial.col].piece = None
-        self.squares[final.row][final.col].piece = piece
-        
-        # Update cached king position
-        if isinstance(piece, King):
-            self._king_positions[piece.color] = (final.row, final.col)
+        undo.captured = self._remove_piece(final.row, final.col)
+        undo.captured_row, undo.captured_col = final.row, final.col
+        self._remove_piece(initial.row, initial.col)
+        self._put_piece(piece, final.row, final.col)
 
         if isinstance(piece, Pawn):
-            diff = final.col - initial.col
-            if diff != 0 and en_passant_empty:
-                self.squares[initial.row][initial.col + diff].piece = None
-            self.check_promotion(piece, final)
+            if undo.captured is None and final.col != initial.col:
+                # En passant: the captured pawn sits beside the starting square
+                undo.captured = self._remove_piece(initial.row, final.col)
+                undo.captured_row, undo.captured_col = initial.row, final.col
+            if final.row == 0 or final.row == 7:
+                self.check_promotion(piece, final, move.promotion)
+                undo.promoted = True
 
-        if isinstance(piece, King):
-            if self.castling(initial, final) and not testing:
-                diff = final.col - initial.col
-                rook = piece.left_rook if (diff < 0) else piece.right_rook
-                self.move(rook, rook.moves[-1])
+        elif isinstance(piece, King):
+            undo.king_position = self._king_positions[piece.color]
+            self._king_positions[piece.color] = (final.row, final.col)
+
+            if self.castling(initial, final):
+                rook_col, rook_final_col = (0, 3) if final.col < initial.col else (7, 5)
+                rook = self._remove_piece(initial.row, rook_col)
+                self._put_piece(rook, initial.row, rook_final_col)
+                undo.rook = rook
+                undo.rook_moved = rook.moved
+                undo.rook_cols = (rook_col, rook_final_col)
+                rook.moved = True
 
         piece.moved = True
-        piece.clear_moves()
         self.last_move = move
+
+        if isinstance(piece, Pawn) or undo.captured is not None:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if piece.color == 'black':
+            self.fullmove_number += 1
+
+        # Side to move, castling rights and en passant file complete the key
+        key = self.hash ^ ZOBRIST_BLACK_TO_MOVE
+        self.turn = 'black' if self.turn == 'white' else 'white'
+        rights = (self.castling_rights & CASTLING_MASKS[initial.row * 8 + initial.col]
+                  & CASTLING_MASKS[final.row * 8 + final.col])
+        if rights != self.castling_rights:
+            key ^= ZOBRIST_CASTLING[self.castling_rights] ^ ZOBRIST_CASTLING[rights]
+            self.castling_rights = rights
+        if self.ep_square is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.ep_square & 7]
+            self.ep_square = None
+        if isinstance(piece, Pawn) and abs(final.row - initial.row) == 2:
+            # Only a square an enemy pawn can take on counts, or the same position
+            # would get two keys and repetitions after a double push go unseen
+            ep_square = (initial.row + final.row) * 4 + final.col
+            if PAWN_ATTACKS[piece.color][ep_square] & self.bitboards[self.turn]['pawn']:
+                self.ep_square = ep_square
+                key ^= ZOBRIST_EN_PASSANT[final.col]
+        self.hash = key
+        return undo
+
+    def unmake_move(self, undo):
+        """Restore the position as it was before the make_move that produced undo"""
+        move = undo.move
+        initial = move.initial
+        final = move.final
+        piece = undo.piece
+
+        self._remove_piece(final.row, final.col)
+        self._put_piece(piece, initial.row, initial.col)
+        if undo.captured is not None:
+            self._put_piece(undo.captured, undo.captured_row, undo.captured_col)
+
+        if undo.king_position is not None:
+            self._king_positions[piece.color] = undo.king_position
+        if undo.rook is not None:
+            rook_col, rook_final_col = undo.rook_cols
+            self._remove_piece(initial.row, rook_final_col)
+            self._put_piece(undo.rook, initial.row, rook_col)
+            undo.rook.moved = undo.rook_moved
+
+        piece.moved = undo.moved
+        self.last_move = undo.last_move
+        self.turn = 'black' if self.turn == 'white' else 'white'
+        self.castling_rights = undo.castling_rights
+        self.ep_square = undo.ep_square
+        self.halfmove_clock = undo.halfmove_clock
+        if piece.color == 'black':
+            self.fullmove_number -= 1
+        self.hash = undo.hash
+        self.hash_history.pop()
+        # Same position as before make_move, so its legality data still holds
+        self._position_cache = undo.position_cache
+
+    def make_null_move(self):
+        """Pass the turn without moving, for null-move pruning in search.
+
+        The en passant square is cleared and the halfmove clock reset, so no
+        repetition is counted across the pass. Returns what unmake_null_move needs.
+        """
+        undo = (self.hash, self.ep_square, self.halfmove_clock, self._position_cache)
+        self.hash_history.append(self.hash)
+        key = self.hash ^ ZOBRIST_BLACK_TO_MOVE
+        if self.ep_square is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.ep_square & 7]
+        self.hash = key
+        self.ep_square = None
+        self.halfmove_clock = 0
+        self.turn = 'black' if self.turn == 'white' else 'white'
+        self._position_cache = None
+        return undo
+
+    def unmake_null_move(self, undo):
+        self.hash, self.ep_square, self.halfmove_clock, self._position_cache = undo
+        self.hash_history.pop()
+        self.turn = 'black' if self.turn == 'white' else 'white'
+
+    def move(self, piece, move, testing=False):
+        self.make_move(move)
+        piece.clear_moves()
         if not testing:
             self.moves_history.append(move)
 
     def valid_move(self, piece, move):
         return move in piece.moves
 
-    def check_promotion(self, piece, final):
+    def check_promotion(self, piece, final, promotion=None):
         if final.row == 0 or final.row == 7:
-            self.squares[final.row][final.col].piece = Queen(piece.color)
+            self._remove_piece(final.row, final.col)
+            self._put_piece(PROMOTION_CLASSES.get(promotion, Queen)(piece.color), final.row, final.col)
 
     def castling(self, initial, final):
         return abs(initial.col - final.col) == 2
 
-    def set_true_en_passant(self, piece):
-        if not isinstance(piece, Pawn):
-            return
-
-        for row in range(ROWS):
-            for col in range(COLS):
-                if isinstance(self.squares[row][col].piece, Pawn):
-                    self.squares[row][col].piece.en_passant = False
-        
-        piece.en_passant = True
+    def attack_map(self, color):
+        """Attacker bitboard for every square, for color's pieces, built once per position.
+
+        Returns (attackers, attacked): attackers[sq] has a bit set for each of
+        color's pieces attacking sq, and attacked is the union of all targets.
+        """
+        cache = self._position_cache
+        if cache is None:
+            cache = self._position_cache = {}
+        key = (color, 'attacks')
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+        attackers = [0] * 64
+        attacked = 0
+        occupied = self.occupied
+        for name, bb in self.bitboards[color].items():
+            for sq in iter_bits(bb):
+                bit = 1 << sq
+                targets = piece_attacks(name, color, sq, occupied)
+                attacked |= targets
+                for target in iter_bits(targets):
+                    attackers[target] |= bit
+
+        result = cache[key] = (attackers, attacked)
+        return result
+
+    def _all_attackers(self, sq, occupied):
+        """Both colors' pieces attacking sq when only the occupied squares hold pieces"""
+        white = self.bitboards['white']
+        black = self.bitboards['black']
+        queens = white['queen'] | black['queen']
+        attackers = (PAWN_ATTACKS['black'][sq] & white['pawn']) | (PAWN_ATTACKS['white'][sq] & black['pawn'])
+        attackers |= KNIGHT_ATTACKS[sq] & (white['knight'] | black['knight'])
+        attackers |= KING_ATTACKS[sq] & (white['king'] | black['king'])
+        attackers |= bishop_attacks(sq, occupied) & (white['bishop'] | black['bishop'] | queens)
+        attackers |= rook_attacks(sq, occupied) & (white['rook'] | black['rook'] | queens)
+        return attackers & occupied
+
+    def _exchange(self, to_sq, gain, on_square, occupied, side):
+        """Swap algorithm behind see(): gain is what the first move takes, on_square
+        the value of the piece left on to_sq, side the color to recapture next."""
+        bitboards = self.bitboards
+        gains = [gain]
+        while True:
+            attackers = self._all_attackers(to_sq, occupied)
+            own = attackers & self.occupancy[side]
+            if not own:
+                break
+            # Least valuable attacker recaptures; sliders behind it join via x-ray next round
+            for name in PIECE_NAMES:
+                candidates = own & bitboards[side][name]
+                if candidates:
+                    break
+            other = 'black' if side == 'white' else 'white'
+            if name == 'king' and attackers & self.occupancy[other]:
+                break  # The king may not capture onto a defended square
+            gains.append(on_square - gains[-1])
+            on_square = piece_values[name]
+            occupied ^= candidates & -candidates
+            side = other
+
+        for i in range(len(gains) - 1, 0, -1):
+            gains[i - 1] = -max(-gains[i - 1], gains[i])
+        return gains[0]
+
+    def see(self, move):
+        """Static exchange evaluation: material the mover nets on move's target square
+        after the best sequence of recaptures (negative when the move loses material).
+        Works for quiet moves too. Pins are ignored."""
+        initial, final = move.initial, move.final
+        from_sq = initial.row * 8 + initial.col
+        to_sq = final.row * 8 + final.col
+        piece = self.squares[initial.row][initial.col].piece
+        target = self.squares[final.row][final.col].piece
+        occupied = self.occupied ^ (1 << from_sq)
+
+        if target is not None:
+            gain = piece_values[target.name]
+        elif isinstance(piece, Pawn) and initial.col != final.col:
+            gain = piece_values['pawn']
+            occupied ^= 1 << (initial.row * 8 + final.col)  # En passant victim
+        else:
+            gain = 0
+        on_square = piece_values[piece.name]
+        if move.promotion:
+            gain += piece_values[move.promotion] - piece_values['pawn']
+            on_square = piece_values[move.promotion]
+
+        side = 'black' if piece.color == 'white' else 'white'
+        return self._exchange(to_sq, gain, on_square, occupied | (1 << to_sq), side)
+
+    def see_square(self, row, col, color):
+        """What color can win by starting captures on the piece at (row, col); 0 if nothing.
+
+        The direct attackers come from the cached attack maps, so testing every
+        piece of a position only builds them once.
+        """
+        target = self.squares[row][col].piece
+        if target is None:
+            return 0
+        to_sq = row * 8 + col
+        attackers = self.attack_map(color)[0][to_sq]
+        if not attackers:
+            return 0
+        for name in PIECE_NAMES:
+            candidates = attackers & self.bitboards[color][name]
+            if candidates:
+                break
+        low = candidates & -candidates
+        side = 'black' if color == 'white' else 'white'
+        if name == 'king' and self.attack_map(side)[0][to_sq]:
+            return 0
+        result = self._exchange(to_sq, piece_values[target.name], piece_values[name], self.occupied ^ low, side)
+        return max(result, 0)
+
+    def is_square_attacked(self, row, col, by_color):
+        """Bitboard attack test: is (row, col) attacked by any piece of by_color"""
+        cache = self._position_cache
+        if cache is not None:
+            result = cache.get((by_color, 'attacks'))
+            if result is not None:
+                return bool(result[1] & (1 << (row * 8 + col)))
+
+        sq = row * 8 + col
+        enemy = self.bitboards[by_color]
+        defender = 'black' if by_color == 'white' else 'white'
+
+        if KNIGHT_ATTACKS[sq] & enemy['knight']:
+            return True
+        if PAWN_ATTACKS[defender][sq] & enemy['pawn']:
+            return True
+        if KING_ATTACKS[sq] & enemy['king']:
+            return True
+        queens = enemy['queen']
+        diagonal = enemy['bishop'] | queens
+        if diagonal and bishop_attacks(sq, self.occupied) & diagonal:
+            return True
+        straight = enemy['rook'] | queens
+        if straight and rook_attacks(sq, self.occupied) & straight:
+            return True
+        return False
 
     def in_check(self, piece, move):
-        """OPTIMIZED: Faster check detection"""
-        temp_piece = copy.deepcopy(piece)
-        temp_board = copy.deepcopy(self)
-        temp_board.move(temp_piece, move, testing=True)
-        
-        # Find king position faster using cached position
-        king_pos = None
-        if isinstance(temp_piece, King):
-            king_pos = (move.final.row, move.final.col)
-        else:
-            # Use cached king position if available
-            if temp_board._king_positions[piece.color]:
-                king_pos = temp_board._king_positions[piece.color]
-            else:
-                # Fallback: search for king
-                for row in range(ROWS):
-                    for col in range(COLS):
-                        p = temp_board.squares[row][col].piece
-                        if isinstance(p, King) and p.color == piece.color:
-                            king_pos = (row, col)
-                            break
-                    if king_pos:
-                        break
-        
-        if not king_pos:
-            return False
-        
-        king_row, king_col = king_pos
-        
-        # Check only opponent pieces that can attack the king
+        """OPTIMIZED: Play the move in place, test the king, then take it back"""
+        undo = self.make_move(move)
+        king_pos = self._king_positions[piece.color]
         opponent_color = 'black' if piece.color == 'white' else 'white'
-        
-        # Fast check: Knight attacks
-        knight_moves = [
-            (king_row-2, king_col+1), (king_row-1, king_col+2),
-            (king_row+1, king_col+2), (king_row+2, king_col+1),
-            (king_row+2, king_col-1), (king_row+1, king_col-2),
-            (king_row-1, king_col-2), (king_row-2, king_col-1)
-        ]
-        for r, c in knight_moves:
-            if Square.in_range(r, c):
-                p = temp_board.squares[r][c].piece
-                if isinstance(p, Knight) and p.color == opponent_color:
-                    return True
-        
-        # Fast check: Pawn attacks
-        pawn_dir = -1 if opponent_color == 'white' else 1
-        for dc in [-1, 1]:
-            r, c = king_row + pawn_dir, king_col + dc
-            if Square.in_range(r, c):
-                p = temp_board.squares[r][c].piece
-                if isinstance(p, Pawn) and p.color == opponent_color:
-                    return True
-        
-        # Fast check: King attacks (for castling validation)
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0:
-                    continue
-                r, c = king_row + dr, king_col + dc
-                if Square.in_range(r, c):
-                    p = temp_board.squares[r][c].piece
-                    if isinstance(p, King) and p.color == opponent_color:
-                        return True
-        
-        # Check sliding pieces (Queen, Rook, Bishop)
-        # Diagonal directions for Bishop/Queen
-        for dr, dc in [(-1, -1), (-1, 1), (1, -1), (1, 1)]:
-            r, c = king_row + dr, king_col + dc
-            while Square.in_range(r, c):
-                p = temp_board.squares[r][c].piece
-                if p:
-                    if p.color == opponent_color and (isinstance(p, Bishop) or isinstance(p, Queen)):
-                        return True
-                    break
-                r += dr
-                c += dc
-        
-        # Straight directions for Rook/Queen
-        for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            r, c = king_row + dr, king_col + dc
-            while Square.in_range(r, c):
-                p = temp_board.squares[r][c].piece
-                if p:
-                    if p.color == opponent_color and (isinstance(p, Rook) or isinstance(p, Queen)):
-                        return True
-                    break
-                r += dr
-                c += dc
-        
-        return False
+        attacked = bool(king_pos) and self.is_square_attacked(king_pos[0], king_pos[1], opponent_color)
+        self.unmake_move(undo)
+        return attacked
+
+    def _legal_context(self, color):
+        """Checkers, pins and enemy attacks for color's king, computed once per position.
+
+        Returns (checkers, check_mask, pins, enemy_attacks): check_mask holds the
+        squares a non-king move must land on (everything when not in check, nothing
+        in double check), pins maps a pinned piece's square to the ray it may move
+        along, and enemy_attacks is computed with our king lifted off the board so
+        the king cannot step back along a checking ray.
+        """
+        cache = self._position_cache
+        if cache is None:
+            cache = self._position_cache = {}
+        key = (color, 'legal')
+        context = cache.get(key)
+        if context is not None:
+            return context
 
-    def calc_moves(self, piece, row, col, bool=True):
-        """OPTIMIZED: Calculate valid moves with minimal overhead"""
+        opponent_color = 'black' if color == 'white' else 'white'
+        own = self.occupancy[color]
+        enemy = self.bitboards[opponent_color]
+        king_bit = self.bitboards[color]['king']
+        if not king_bit:
+            context = cache[key] = (0, FULL_BOARD, {}, 0)
+            return context
+
+        king_sq = king_bit.bit_length() - 1
+        checkers = KNIGHT_ATTACKS[king_sq] & enemy['knight']
+        checkers |= PAWN_ATTACKS[color][king_sq] & enemy['pawn']
+        check_mask = checkers
+        pins = {}
+
+        # Look along each ray out from the king: the nearest piece is a checker if
+        # it is an enemy slider, or pinned if it is ours and the next one is
+        queens = enemy['queen']
+        occupied = self.occupied
+        for directions, sliders in ((DIAGONAL_DIRECTIONS, enemy['bishop'] | queens),
+                                    (STRAIGHT_DIRECTIONS, enemy['rook'] | queens)):
+            if not sliders:
+                continue
+            for index in directions:
+                masks = RAY_MASKS[index]
+                blocked = masks[king_sq] & occupied
+                if not blocked:
+                    continue
+                positive = POSITIVE_DIRECTION[index]
+                nearest = (blocked & -blocked) if positive else 1 << (blocked.bit_length() - 1)
+                if nearest & sliders:
+                    checkers |= nearest
+                    check_mask |= masks[king_sq] ^ masks[nearest.bit_length() - 1]
+                    continue
+                if not nearest & own:
+                    continue
+                blocked ^= nearest
+                if not blocked:
+                    continue
+                pinner = (blocked & -blocked) if positive else 1 << (blocked.bit_length() - 1)
+                if pinner & sliders:
+                    pins[nearest.bit_length() - 1] = masks[king_sq] ^ masks[pinner.bit_length() - 1]
+
+        if not checkers:
+            check_mask = FULL_BOARD
+        elif checkers & (checkers - 1):
+            check_mask = 0  # Double check: only the king may move
+
+        occupied ^= king_bit
+        enemy_attacks = knight_attacks(enemy['knight'])
+        enemy_attacks |= pawn_attacks(enemy['pawn'], opponent_color)
+        enemy_attacks |= king_attacks(enemy['king'])
+        for sq in iter_bits(enemy['bishop'] | queens):
+            enemy_attacks |= bishop_attacks(sq, occupied)
+        for sq in iter_bits(enemy['rook'] | queens):
+            enemy_attacks |= rook_attacks(sq, occupied)
+
+        context = cache[key] = (checkers, check_mask, pins, enemy_attacks)
+        return context
+
+    def calc_moves(self, piece, row, col, bool=True, stage=None):
+        """OPTIMIZED: Calculate valid moves from bitboard target sets.
+
+        With bool=True only legal moves are produced: targets are masked by the
+        position's check and pin masks instead of simulating every move.
+        stage='captures' keeps only captures and promotions, stage='quiet' only
+        the remaining moves (castling included).
+        """
         piece.clear_moves()
-        
+        sq = row * 8 + col
+        bit = 1 << sq
+        origin = SQUARES[sq]
+        own = self.occupancy[piece.color]
+        enemy = self.occupied ^ own
+        legal_mask = FULL_BOARD
+        if bool:
+            checkers, check_mask, pins, enemy_attacks = self._legal_context(piece.color)
+            if not isinstance(piece, King):
+                legal_mask = check_mask & pins.get(sq, FULL_BOARD)
+                if not legal_mask:
+                    return
+        if stage == 'captures':
+            stage_mask = enemy
+        elif stage == 'quiet':
+            stage_mask = FULL_BOARD ^ self.occupied
+        else:
+            stage_mask = FULL_BOARD
+
+        def add_targets(targets):
+            for target in iter_bits(targets & legal_mask & stage_mask):
+                piece.add_move(Move(origin, SQUARES[target]))
+
         def pawn_moves():
-            steps = 1 if piece.moved else 2
-            start = row + piece.dir
-            end = row + (piece.dir * (1 + steps))
-            
-            for move_row in range(start, end, piece.dir):
-                if Square.in_range(move_row):
-                    if self.squares[move_row][col].isempty():
-                        initial = Square(row, col)
-                        final = Square(move_row, col)
-                        move = Move(initial, final)
-                        if bool:
-                            if not self.in_check(piece, move):
-                                piece.add_move(move)
-                        else:
-                            piece.add_move(move)
-                    else:
-                        break
+            # Single and double pushes onto empty squares
+            push = (bit << 8) if piece.dir > 0 else (bit >> 8)
+            targets = push & ~self.occupied
+            if targets and row == (6 if piece.color == 'white' else 1):
+                double = (push << 8) if piece.dir > 0 else (push >> 8)
+                targets |= double & ~self.occupied
+            targets |= PAWN_ATTACKS[piece.color][sq] & enemy
+            if row == (1 if piece.color == 'white' else 6):
+                # Every target is on the last rank: one move per promotion piece
+                if stage != 'quiet':
+                    for target in iter_bits(targets & legal_mask):
+                        for promotion in PROMOTION_PIECES:
+                            piece.add_move(Move(origin, SQUARES[target], promotion))
+            else:
+                add_targets(targets & FULL_BOARD)
+
+            ep_square = self.ep_square
+            if ep_square is not None and stage != 'quiet' \
+                    and row == (3 if piece.color == 'white' else 4) \
+                    and PAWN_ATTACKS[piece.color][sq] & (1 << ep_square):
+                move = Move(origin, SQUARES[ep_square])
+                # En passant removes two pieces from a line, which the
+                # pin masks cannot see, so simulate this rare case
+                if bool:
+                    if not self.in_check(piece, move):
+                        piece.add_move(move)
                 else:
-                    break
-
-            move_row = row + piece.dir
-            for move_col in [col-1, col+1]:
-                if Square.in_range(move_row, move_col):
-                    if self.squares[move_row][move_col].has_enemy_piece(piece.color):
-                        initial = Square(row, col)
-                        final_piece = self.squares[move_row][move_col].piece
-                        final = Square(move_row, move_col, final_piece)
-                        move = Move(initial, final)
-                        if bool:
-                            if not self.in_check(piece, move):
-                                piece.add_move(move)
-                        else:
-                            piece.add_move(move)
-
-            r = 3 if piece.color == 'white' else 4
-            fr = 2 if piece.color == 'white' else 5
-            for side in [-1, 1]:
-                if Square.in_range(col+side) and row == r:
-                    if self.squares[row][col+side].has_enemy_piece(piece.color):
-                        p = self.squares[row][col+side].piece
-                        if isinstance(p, Pawn) and p.en_passant:
-                            initial = Square(row, col)
-                            final = Square(fr, col+side, p)
-                            move = Move(initial, final)
-                            if bool:
-                                if not self.in_check(piece, move):
-                                    piece.add_move(move)
-                            else:
-                                piece.add_move(move)
-
-        def knight_moves():
-            possible_moves = [
-                (row-2, col+1), (row-1, col+2), (row+1, col+2), (row+2, col+1),
-                (row+2, col-1), (row+1, col-2), (row-1, col-2), (row-2, col-1),
-            ]
-
-            for move_row, move_col in possible_moves:
-                if Square.in_range(move_row, move_col):
-                    if self.squares[move_row][move_col].isempty_or_enemy(piece.color):
-                        initial = Square(row, col)
-                        final_piece = self.squares[move_row][move_col].piece
-                        final = Square(move_row, move_col, final_piece)
-                        move = Move(initial, final)
-                        if bool:
-                            if not self.in_check(piece, move):
-                                piece.add_move(move)
-                        else:
-                            piece.add_move(move)
-
-        def straightline_moves(incrs):
-            for row_incr, col_incr in incrs:
-                move_row = row + row_incr
-                move_col = col + col_incr
-
-                while Square.in_range(move_row, move_col):
-                    initial = Square(row, col)
-                    final_piece = self.squares[move_row][move_col].piece
-                    final = Square(move_row, move_col, final_piece)
-                    move = Move(initial, final)
-
-                    if self.squares[move_row][move_col].isempty():
-                        if bool:
-                            if not self.in_check(piece, move):
-                                piece.add_move(move)
-                        else:
-                            piece.add_move(move)
-                    elif self.squares[move_row][move_col].has_enemy_piece(piece.color):
-                        if bool:
-                            if not self.in_check(piece, move):
-                                piece.add_move(move)
-                        else:
-                            piece.add_move(move)
-                        break
-                    elif self.squares[move_row][move_col].has_team_piece(piece.color):
-                        break
-
-                    move_row += row_incr
-                    move_col += col_incr
+                    piece.add_move(move)
 
         def king_moves():
-            adjs = [
-                (row-1, col+0), (row-1, col+1), (row+0, col+1), (row+1, col+1),
-                (row+1, col+0), (row+1, col-1), (row+0, col-1), (row-1, col-1),
-            ]
-
-            for move_row, move_col in adjs:
-                if Square.in_range(move_row, move_col):
-                    if self.squares[move_row][move_col].isempty_or_enemy(piece.color):
-                        initial = Square(row, col)
-                        final = Square(move_row, move_col)
-                        move = Move(initial, final)
-                        if bool:
-                            if not self.in_check(piece, move):
-                                piece.add_move(move)
-                        else:
-                            piece.add_move(move)
-
-            if not piece.moved:
+            targets = KING_ATTACKS[sq] & ~own
+            if bool:
+                targets &= ~enemy_attacks
+            add_targets(targets)
+
+            if piece.color == 'white':
+                kingside, queenside = WHITE_KINGSIDE, WHITE_QUEENSIDE
+            else:
+                kingside, queenside = BLACK_KINGSIDE, BLACK_QUEENSIDE
+            rights = self.castling_rights
+            if rights & (kingside | queenside) and not (bool and checkers) and stage != 'captures':
                 # Queen side castling
-                left_rook = self.squares[row][0].piece
-                if isinstance(left_rook, Rook) and not left_rook.moved:
-                    clear_path = all(not self.squares[row][c].has_piece() for c in range(1, 4))
-                    if clear_path:
-                        piece.left_rook = left_rook
-                        moveR = Move(Square(row, 0), Square(row, 3))
-                        moveK = Move(Square(row, col), Square(row, 2))
-                        if bool:
-                            if not self.in_check(piece, moveK) and not self.in_check(left_rook, moveR):
-                                left_rook.add_move(moveR)
-                                piece.add_move(moveK)
-                        else:
-                            left_rook.add_move(moveR)
-                            piece.add_move(moveK)
+                if rights & queenside:
+                    clear_path = not self.occupied & (0b1110 << (row * 8))
+                    safe_path = not (bool and enemy_attacks & (0b1100 << (row * 8)))
+                    if clear_path and safe_path:
+                        piece.add_move(Move(origin, SQUARES[sq - 2]))
 
                 # King side castling
-                right_rook = self.squares[row][7].piece
-                if isinstance(right_rook, Rook) and not right_rook.moved:
-                    clear_path = all(not self.squares[row][c].has_piece() for c in range(5, 7))
-                    if clear_path:
-                        piece.right_rook = right_rook
-                        moveR = Move(Square(row, 7), Square(row, 5))
-                        moveK = Move(Square(row, col), Square(row, 6))
-                        if bool:
-                            if not self.in_check(piece, moveK) and not self.in_check(right_rook, moveR):
-                                right_rook.add_move(moveR)
-                                piece.add_move(moveK)
-                        else:
-                            right_rook.add_move(moveR)
-                            piece.add_move(moveK)
+                if rights & kingside:
+                    path = 0b01100000 << (row * 8)
+                    clear_path = not self.occupied & path
+                    safe_path = not (bool and enemy_attacks & path)
+                    if clear_path and safe_path:
+                        piece.add_move(Move(origin, SQUARES[sq + 2]))
 
         if isinstance(piece, Pawn):
             pawn_moves()
         elif isinstance(piece, Knight):
-            knight_moves()
+            add_targets(KNIGHT_ATTACKS[sq] & ~own)
         elif isinstance(piece, Bishop):
-            straightline_moves([(-1, 1), (-1, -1), (1, 1), (1, -1)])
+            add_targets(bishop_attacks(sq, self.occupied) & ~own)
         elif isinstance(piece, Rook):
-            straightline_moves([(-1, 0), (0, 1), (1, 0), (0, -1)])
+            add_targets(rook_attacks(sq, self.occupied) & ~own)
         elif isinstance(piece, Queen):
-            straightline_moves([(-1, 1), (-1, -1), (1, 1), (1, -1), (-1, 0), (0, 1), (1, 0), (0, -1)])
+            add_targets(queen_attacks(sq, self.occupied) & ~own)
         elif isinstance(piece, King):
             king_moves()
 
@@ -834,21 +1572,20 @@ class Board:
         row_pawn, row_other = (6, 7) if color == 'white' else (1, 0)
 
         for col in range(COLS):
-            self.squares[row_pawn][col].piece = Pawn(color)
+            self._put_piece(Pawn(color), row_pawn, col)
 
-        self.squares[row_other][1].piece = Knight(color)
-        self.squares[row_other][6].piece = Knight(color)
+        self._put_piece(Knight(color), row_other, 1)
+        self._put_piece(Knight(color), row_other, 6)
 
-        self.squares[row_other][2].piece = Bishop(color)
-        self.squares[row_other][5].piece = Bishop(color)
+        self._put_piece(Bishop(color), row_other, 2)
+        self._put_piece(Bishop(color), row_other, 5)
 
-        self.squares[row_other][0].piece = Rook(color)
-        self.squares[row_other][7].piece = Rook(color)
+        self._put_piece(Rook(color), row_other, 0)
+        self._put_piece(Rook(color), row_other, 7)
 
-        self.squares[row_other][3].piece = Queen(color)
+        self._put_piece(Queen(color), row_other, 3)
 
-        king = King(color)
-        self.squares[row_other][4].piece = king
+        self._put_piece(King(color), row_other, 4)
         self._king_positions[color] = (row_other, 4)  # Cache king position
 
     def to_dict(self):
@@ -856,55 +1593,257 @@ class Board:
                 for square in row] 
                 for row in self.squares]
 
+    def iter_pieces(self, color, name=None):
+        """Yield (piece, row, col) for color's pieces, optionally of one type.
+
+        Walks the occupancy bitboards, so only live pieces are visited.
+        """
+        squares = self.squares
+        bb = self.bitboards[color][name] if name else self.occupancy[color]
+        while bb:
+            low = bb & -bb
+            sq = low.bit_length() - 1
+            bb ^= low
+            row, col = sq >> 3, sq & 7
+            yield squares[row][col].piece, row, col
+
+    def piece_count(self, color, name=None):
+        """Number of color's pieces, optionally of one type"""
+        return popcount(self.bitboards[color][name] if name else self.occupancy[color])
+
     def get_all_moves(self, color):
         moves = []
-        for row in range(ROWS):
-            for col in range(COLS):
-                piece = self.squares[row][col].piece
-                if piece and piece.color == color:
-                    self.calc_moves(piece, row, col)
-                    moves.extend(piece.moves)
-                    piece.clear_moves()
+        for piece, row, col in self.iter_pieces(color):
+            self.calc_moves(piece, row, col)
+            moves.extend(piece.moves)
+            piece.clear_moves()
         return moves
 
-    def in_check_king(self, color):
-        """OPTIMIZED: Use cached king position"""
-        if self._king_positions[color]:
-            king_row, king_col = self._king_positions[color]
-        else:
-            # Fallback: search for king
-            king_row, king_col = None, None
-            for row in range(ROWS):
-                for col in range(COLS):
-                    piece = self.squares[row][col].piece
-                    if isinstance(piece, King) and piece.color == color:
-                        king_row, king_col = row, col
-                        self._king_positions[color] = (row, col)
-                        break
-                if king_row is not None:
-                    break
+    def is_legal_move(self, move, color):
+        """Whether move is currently legal for color (e.g. a stored hash or killer move)"""
+        initial = move.initial
+        piece = self.squares[initial.row][initial.col].piece
+        if piece is None or piece.color != color:
+            return False
+        self.calc_moves(piece, initial.row, initial.col)
+        legal = move in piece.moves
+        piece.clear_moves()
+        return legal
 
-        if king_row is None:
+    def is_capture(self, move):
+        """Whether move takes a piece, en passant included"""
+        final = move.final
+        if self.squares[final.row][final.col].piece is not None:
+            return True
+        piece = self.squares[move.initial.row][move.initial.col].piece
+        return isinstance(piece, Pawn) and move.initial.col != final.col
+
+    def gives_check(self, move):
+        """Whether move checks the enemy king, found from attack sets without playing it.
+
+        Sliders are only traced when the empty-board lines say they could reach
+        the king, so most moves cost a couple of table lookups.
+        """
+        initial, final = move.initial, move.final
+        piece = self.squares[initial.row][initial.col].piece
+        color = piece.color
+        enemy = 'black' if color == 'white' else 'white'
+        king = self.bitboards[enemy]['king']
+        if not king:
             return False
+        king_sq = king.bit_length() - 1
+        from_sq = initial.row * 8 + initial.col
+        to_sq = final.row * 8 + final.col
+        from_bit = 1 << from_sq
+        occupied = (self.occupied ^ from_bit) | (1 << to_sq)
+        name = move.promotion or piece.name
+        discovered_from = from_bit
+
+        if piece.name == 'king':
+            if abs(final.col - initial.col) != 2:
+                name = None  # A king never checks; it can only uncover one
+            else:
+                # Castling: the rook lands beside the king and may give check
+                rook_from = initial.row * 8 + (7 if final.col > initial.col else 0)
+                rook_to = (initial.row * 8 + final.col - 1 if final.col > initial.col
+                           else initial.row * 8 + final.col + 1)
+                occupied ^= (1 << rook_from) | (1 << rook_to)
+                return bool(rook_attacks(rook_to, occupied) & king)
+        elif piece.name == 'pawn' and initial.col != final.col \
+                and self.squares[final.row][final.col].piece is None:
+            captured_bit = 1 << (initial.row * 8 + final.col)  # En passant victim
+            occupied ^= captured_bit
+            discovered_from |= captured_bit
+
+        # Direct check by the piece on its new square
+        if name == 'pawn' or name == 'knight':
+            if piece_attacks(name, color, to_sq, occupied) & king:
+                return True
+        elif name is not None:
+            if (name != 'rook' and BISHOP_LINES[to_sq] & king
+                    and bishop_attacks(to_sq, occupied) & king):
+                return True
+            if (name != 'bishop' and ROOK_LINES[to_sq] & king
+                    and rook_attacks(king_sq, occupied) & (1 << to_sq)):
+                return True
+
+        # Discovered check by a slider behind a vacated square
+        own = self.bitboards[color]
+        movers = FULL_BOARD ^ from_bit
+        diagonal = (own['bishop'] | own['queen']) & movers
+        straight = (own['rook'] | own['queen']) & movers
+        if (BISHOP_LINES[king_sq] & discovered_from and BISHOP_LINES[king_sq] & diagonal
+                and bishop_attacks(king_sq, occupied) & diagonal):
+            return True
+        if (ROOK_LINES[king_sq] & discovered_from and ROOK_LINES[king_sq] & straight
+                and rook_attacks(king_sq, occupied) & straight):
+            return True
+        return False
+
+    def _stage_moves(self, color, stage):
+        moves = []
+        for piece, row, col in self.iter_pieces(color):
+            self.calc_moves(piece, row, col, stage=stage)
+            moves.extend(piece.moves)
+            piece.clear_moves()
+        return moves
+
+    def iter_moves(self, color, stage='all', hash_move=None, killers=(), order=None):
+        """Lazily yield color's legal moves in search order.
+
+        Stages: the hash move, captures and promotions, killer moves, then quiet
+        moves. Each stage is generated only when the caller asks for its first
+        move, so a cutoff during the captures never builds the quiet moves.
+        stage='captures' stops after the captures. order, if given, sorts the
+        moves of each generated stage (e.g. ChessAI.order_moves).
+
+        The caller may make and unmake moves between items, as long as the board
+        is back in this position when the next move is requested.
+        """
+        played = []
+        if hash_move is not None and self.is_legal_move(hash_move, color):
+            played.append(hash_move)
+            yield hash_move
+
+        captures = self._stage_moves(color, 'captures')
+        if order is not None:
+            captures = order(captures)
+        for move in captures:
+            if move not in played:
+                yield move
+        if stage == 'captures':
+            return
+
+        for move in killers:
+            if move is not None and move not in played and not move.promotion \
+                    and not self.is_capture(move) and self.is_legal_move(move, color):
+                played.append(move)
+                yield move
+
+        quiets = self._stage_moves(color, 'quiet')
+        if order is not None:
+            quiets = order(quiets)
+        for move in quiets:
+            if move not in played:
+                yield move
+
+    def perft(self, depth):
+        """Count the leaf nodes of the legal move tree, for move generator testing"""
+        if depth == 0:
+            return 1
+        moves = self.get_all_moves(self.turn)
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for move in moves:
+            undo = self.make_move(move)
+            nodes += self.perft(depth - 1)
+            self.unmake_move(undo)
+        return nodes
+
+    def divide(self, depth):
+        """Perft split by root move, as {uci: node count}"""
+        counts = {}
+        for move in self.get_all_moves(self.turn):
+            undo = self.make_move(move)
+            counts[move.uci()] = self.perft(depth - 1)
+            self.unmake_move(undo)
+        return counts
 
+    def in_check_king(self, color):
+        """OPTIMIZED: Read cached checkers or attack maps, else a bitboard attack test"""
+        cache = self._position_cache
+        if cache is not None:
+            context = cache.get((color, 'legal'))
+            if context is not None:
+                return bool(context[0])
+
+        if not self._king_positions[color]:
+            king_bb = self.bitboards[color]['king']
+            if not king_bb:
+                return False
+            sq = king_bb.bit_length() - 1
+            self._king_positions[color] = (sq >> 3, sq & 7)
+
+        king_row, king_col = self._king_positions[color]
         opponent_color = 'black' if color == 'white' else 'white'
-        
-        # Only check pieces that can actually attack the king
-        for row in range(ROWS):
-            for col in range(COLS):
-                piece = self.squares[row][col].piece
-                if piece and piece.color == opponent_color:
-                    self.calc_moves(piece, row, col, bool=False)
-                    for m in piece.moves:
-                        if m.final.row == king_row and m.final.col == king_col:
-                            return True
+        return self.is_square_attacked(king_row, king_col, opponent_color)
+
+    def has_legal_move(self, color):
+        """Whether color has any legal move, stopping at the first one found.
+
+        Pieces are tried cheapest first; the check and pin masks come from
+        the position cache, so this is usually just a king or knight lookup.
+        """
+        for name in ('king', 'knight', 'pawn', 'bishop', 'rook', 'queen'):
+            for piece, row, col in self.iter_pieces(color, name):
+                self.calc_moves(piece, row, col)
+                found = bool(piece.moves)
+                piece.clear_moves()
+                if found:
+                    return True
         return False
 
+    def repetition_count(self):
+        """How many times the current position has occurred in this game"""
+        history = self.hash_history
+        # Only positions since the last capture or pawn move with the same side to move can match
+        stop = max(len(history) - self.halfmove_clock, 0) - 1
+        count = 1
+        for i in range(len(history) - 2, stop, -2):
+            if history[i] == self.hash:
+                count += 1
+        return count
+
+    def is_insufficient_material(self):
+        """Neither side can mate: bare kings plus at most one minor, or bishops all on one color"""
+        white = self.bitboards['white']
+        black = self.bitboards['black']
+        if white['pawn'] | white['rook'] | white['queen'] | black['pawn'] | black['rook'] | black['queen']:
+            return False
+        knights = white['knight'] | black['knight']
+        bishops = white['bishop'] | black['bishop']
+        if popcount(knights | bishops) <= 1:
+            return True
+        return not knights and not (bishops & LIGHT_SQUARES and bishops & DARK_SQUARES)
+
     def is_game_over(self, color):
-        moves = self.get_all_moves(color)
-        if not moves:
+        """'checkmate', 'stalemate', a draw reason ('insufficient_material',
+        'threefold_repetition', 'fifty_move_rule') or None while play goes on"""
+        if not self.has_legal_move(color):
             if self.in_check_king(color):
                 return 'checkmate'
             else:
                 return 'stalemate'
-        return False
\ No newline at end of file
+        if self.is_insufficient_material():
+            return 'insufficient_material'
+        if self.halfmove_clock >= 100:
+            return 'fifty_move_rule'
+        if self.halfmove_clock >= 8 and self.repetition_count() >= 3:
+            return 'threefold_repetition'
+        return None
+
+FEN_PIECES = {'p': Pawn, 'n': Knight, 'b': Bishop, 'r': Rook, 'q': Queen, 'k': King}
+PROMOTION_CLASSES = {'queen': Queen, 'rook': Rook, 'bishop': Bishop, 'knight': Knight}
+FEN_CHARS = {'pawn': 'p', 'knight': 'n', 'bishop': 'b', 'rook': 'r', 'queen': 'q', 'king': 'k'}
+PIECE_CLASSES = {'pawn': Pawn, 'knight': Knight, 'bishop': Bishop, 'rook': Rook, 'queen': Queen, 'king': King}
@@ -582,6 +582,12 @@ function showGameResult(data) {
         resultText = `Checkmate! ${data.winner.charAt(0).toUpperCase() + data.winner.slice(1)} Wins!`;
     } else if (data.result === 'stalemate') {
         resultText = 'Stalemate - Draw!';
+    } else if (data.result === 'insufficient_material') {
+        resultText = 'Insufficient Material - Draw!';
+    } else if (data.result === 'threefold_repetition') {
+        resultText = 'Threefold Repetition - Draw!';
+    } else if (data.result === 'fifty_move_rule') {
+        resultText = 'Fifty-Move Rule - Draw!';
     } else if (data.result === 'resignation') {
         resultText = `Resignation! ${data.winner.charAt(0).toUpperCase() + data.winner.slice(1)} Wins!`;
     } else {